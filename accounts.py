@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+
+from appdata import data_path
+
+
+class AccountStore:
+    """
+    User accounts, kept in an append-only log with an in-memory index.
+
+    Each line of the log is a JSON record for one account; a later record
+    for the same username replaces the earlier one. The log is read into a
+    dict on a background thread as soon as the store is created, so the
+    login window can be drawn while it loads and every lookup after that
+    is a single dict access. The log is rewritten without the replaced
+    records once they make up most of it.
+
+    `defaults` are accounts created the first time the store is empty,
+    such as the built-in admin account.
+    """
+
+    COMPACT_MIN_RECORDS = 1000
+
+    def __init__(self, path=None, defaults=None):
+        self.path = path or data_path("accounts.log")
+        self._defaults = defaults or {}
+        self._accounts = {}
+        self._records = 0  # Lines in the log, including replaced ones
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        threading.Thread(target=self._load, name="account-store", daemon=True).start()
+
+    def wait_until_loaded(self):
+        self._loaded.wait()
+
+    def __len__(self):
+        self.wait_until_loaded()
+        return len(self._accounts)
+
+    def __contains__(self, username):
+        return self.get(username) is not None
+
+    def get(self, username):
+        """Returns an account's record (a dict), or None if there is no such account."""
+        self.wait_until_loaded()
+        return self._accounts.get(username)
+
+    def add(self, username, record):
+        """Creates an account. Returns False if the username is already taken."""
+        self.wait_until_loaded()
+        with self._lock:
+            if username in self._accounts:
+                return False
+            self._write(username, record)
+            return True
+
+    def update(self, username, record):
+        """Replaces the record of an existing account."""
+        self.wait_until_loaded()
+        with self._lock:
+            if username not in self._accounts:
+                raise KeyError(username)
+            self._write(username, record)
+
+    def _write(self, username, record):
+        """
+        Records an account in memory, then in the log. Raises OSError if
+        the log can't be written, leaving the account usable until exit.
+        """
+        self._accounts[username] = record
+        line = json.dumps(dict(record, username=username)) + "\n"
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        with os.fdopen(fd, "a", encoding="utf-8") as f:
+            f.write(line)
+        self._records += 1
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        username = record.pop("username")
+                    except (ValueError, KeyError, AttributeError):
+                        continue  # A line cut short by a crash
+                    self._accounts[username] = record
+                    self._records += 1
+        except OSError:
+            pass
+        try:
+            with self._lock:
+                if not self._accounts:
+                    for username, record in self._defaults.items():
+                        self._write(username, record)
+                elif self._records > max(self.COMPACT_MIN_RECORDS, 2 * len(self._accounts)):
+                    self._compact()
+        except OSError:
+            pass  # The default accounts still work until HomeOS exits
+        finally:
+            self._loaded.set()
+
+    def _compact(self):
+        """Rewrites the log with only the current record of each account."""
+        temp_path = self.path + ".tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(dict(record, username=username)) + "\n"
+                         for username, record in self._accounts.items())
+        os.replace(temp_path, self.path)
+        self._records = len(self._accounts)
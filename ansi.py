@@ -0,0 +1,181 @@
+import re
+
+# The 16 basic colours (SGR 30-37 and 90-97), chosen to read well on a
+# dark background
+PALETTE = (
+    "#000000", "#cd3131", "#0dbc79", "#e5e510",
+    "#2472c8", "#bc3fbc", "#11a8cd", "#e5e5e5",
+    "#666666", "#f14c4c", "#23d18b", "#f5f543",
+    "#3b8eea", "#d670d6", "#29b8db", "#ffffff",
+)
+
+# Tags for text attributes; colour tags are "fg#rrggbb" and "bg#rrggbb"
+BOLD = "bold"
+UNDERLINE = "underline"
+
+# CSI sequences (ESC [ ... final byte), OSC strings (ESC ] ... BEL or ST)
+# and two-character escapes. Only SGR ('m') sequences change the style;
+# everything else is dropped from the output.
+_ESCAPE = re.compile(
+    r"\x1b(?:\[([0-?]*)[ -/]*([@-~])|\][^\x07\x1b]*(?:\x07|\x1b\\)|[@-Z\\^_])")
+
+# The start of a sequence cut off at the end of the text
+_PARTIAL = re.compile(r"\x1b(?:\[[0-?]*[ -/]*|\][^\x07\x1b]*)?\Z")
+
+
+def color_256(index):
+    """Returns the "#rrggbb" colour of an xterm 256-colour index."""
+    if index < 16:
+        return PALETTE[index]
+    if index < 232:
+        index -= 16
+        levels = [0 if value == 0 else 55 + value * 40
+                  for value in (index // 36, index // 6 % 6, index % 6)]
+        return "#{:02x}{:02x}{:02x}".format(*levels)
+    gray = 8 + (index - 232) * 10
+    return f"#{gray:02x}{gray:02x}{gray:02x}"
+
+
+def tag_options(tag):
+    """
+    Returns the Text tag options for a colour tag, or None for an
+    attribute tag, whose look depends on the widget's font.
+    """
+    if tag.startswith("fg#"):
+        return {"foreground": tag[2:]}
+    if tag.startswith("bg#"):
+        return {"background": tag[2:]}
+    return None
+
+
+class AnsiParser:
+    """
+    A streaming parser for ANSI SGR escape sequences.
+
+    feed() turns text into (text, tags) runs, where tags is a tuple of tag
+    names for the Text widget, ready to be passed to a single insert call.
+    The current style and any escape sequence cut off at the end of the
+    text carry over to the next call. 16-colour, 256-colour and truecolor
+    foregrounds and backgrounds are supported, plus bold and underline.
+    """
+
+    def __init__(self):
+        # (style, parameters) -> style after the sequence; output tends to
+        # repeat the same few sequences, so most are only decoded once
+        self._transitions = {}
+        self.reset()
+
+    def reset(self):
+        """Returns to the default style and drops any partial sequence."""
+        self.fg = None
+        self.bg = None
+        self.bold = False
+        self.underline = False
+        self.tags = ()
+        self._pending = ""
+
+    def feed(self, text):
+        """Returns the (text, tags) runs of a piece of output."""
+        if self._pending:
+            text, self._pending = self._pending + text, ""
+        runs = []
+        position = 0
+        for match in _ESCAPE.finditer(text):
+            if match.start() > position:
+                self._emit(runs, text[position:match.start()])
+            if match.group(2) == "m":
+                self._apply(match.group(1))
+            position = match.end()
+
+        rest = text[position:]
+        partial = _PARTIAL.search(rest)
+        if partial is not None:
+            self._pending = partial.group()
+            rest = rest[:partial.start()]
+        if rest:
+            self._emit(runs, rest)
+        return runs
+
+    def _emit(self, runs, text):
+        text = text.replace("\x1b", "")  # Stray escapes that start no sequence
+        if not text:
+            return
+        if runs and runs[-1][1] == self.tags:
+            runs[-1] = (runs[-1][0] + text, self.tags)
+        else:
+            runs.append((text, self.tags))
+
+    def _apply(self, params):
+        """Updates the style from the parameters of one SGR sequence."""
+        key = (self.fg, self.bg, self.bold, self.underline, params)
+        style = self._transitions.get(key)
+        if style is None:
+            if len(self._transitions) >= 4096:
+                self._transitions.clear()  # Truecolor gradients never repeat
+            self._decode(params)
+            style = self._transitions[key] = (
+                self.fg, self.bg, self.bold, self.underline, self.tags)
+        else:
+            self.fg, self.bg, self.bold, self.underline, self.tags = style
+
+    def _decode(self, params):
+        codes = [int(code) if code.isdigit() else 0 for code in params.split(";")]
+        i = 0
+        while i < len(codes):
+            code = codes[i]
+            if code == 0:
+                self.fg = self.bg = None
+                self.bold = self.underline = False
+            elif code == 1:
+                self.bold = True
+            elif code == 22:
+                self.bold = False
+            elif code == 4:
+                self.underline = True
+            elif code == 24:
+                self.underline = False
+            elif 30 <= code <= 37:
+                self.fg = PALETTE[code - 30]
+            elif 90 <= code <= 97:
+                self.fg = PALETTE[code - 90 + 8]
+            elif code == 39:
+                self.fg = None
+            elif 40 <= code <= 47:
+                self.bg = PALETTE[code - 40]
+            elif 100 <= code <= 107:
+                self.bg = PALETTE[code - 100 + 8]
+            elif code == 49:
+                self.bg = None
+            elif code in (38, 48):
+                color, used = self._extended_color(codes[i + 1:])
+                if color is not None:
+                    if code == 38:
+                        self.fg = color
+                    else:
+                        self.bg = color
+                i += used
+            i += 1
+
+        tags = []
+        if self.fg is not None:
+            tags.append("fg" + self.fg)
+        if self.bg is not None:
+            tags.append("bg" + self.bg)
+        if self.bold:
+            tags.append(BOLD)
+        if self.underline:
+            tags.append(UNDERLINE)
+        self.tags = tuple(tags)
+
+    @staticmethod
+    def _extended_color(codes):
+        """
+        Reads the colour after a 38 or 48 code: '5;n' or '2;r;g;b'.
+        Returns the colour (or None if malformed) and how many codes it used.
+        """
+        if len(codes) >= 2 and codes[0] == 5:
+            return color_256(min(codes[1], 255)), 2
+        if len(codes) >= 4 and codes[0] == 2:
+            red, green, blue = (min(value, 255) for value in codes[1:4])
+            return f"#{red:02x}{green:02x}{blue:02x}", 4
+        return None, len(codes)
@@ -0,0 +1,141 @@
+import time
+
+
+class _Timer:
+    __slots__ = ("callback", "interval", "due", "after_id")
+
+    def __init__(self, callback, interval, due):
+        self.callback = callback
+        self.interval = interval  # Milliseconds between runs, or None to run once
+        self.due = due            # time.monotonic() it is due, or seconds left while suspended
+        self.after_id = None
+
+
+class AppTimers:
+    """
+    after() callbacks belonging to one app, which stop while it is suspended.
+
+    Suspending cancels the underlying Tk timers and remembers how long
+    each one had left; resuming schedules them again for that remaining
+    time, so a hidden app costs the event loop nothing.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.suspended = False
+        self._timers = {}
+        self._next_id = 0
+
+    def after(self, ms, callback):
+        """Runs callback once after `ms` milliseconds of the app not being suspended."""
+        return self._add(callback, ms, None)
+
+    def every(self, ms, callback):
+        """Runs callback every `ms` milliseconds while the app is not suspended."""
+        return self._add(callback, ms, ms)
+
+    def cancel(self, timer_id):
+        timer = self._timers.pop(timer_id, None)
+        if timer is not None and timer.after_id is not None:
+            self.widget.after_cancel(timer.after_id)
+
+    def cancel_all(self):
+        for timer_id in list(self._timers):
+            self.cancel(timer_id)
+
+    def suspend(self):
+        if self.suspended:
+            return
+        self.suspended = True
+        now = time.monotonic()
+        for timer in self._timers.values():
+            if timer.after_id is not None:
+                self.widget.after_cancel(timer.after_id)
+                timer.after_id = None
+            timer.due = max(0.0, timer.due - now)
+
+    def resume(self):
+        if not self.suspended:
+            return
+        self.suspended = False
+        now = time.monotonic()
+        for timer_id, timer in self._timers.items():
+            remaining, timer.due = timer.due, now + timer.due
+            self._schedule(timer_id, timer, int(remaining * 1000))
+
+    def _add(self, callback, ms, interval):
+        timer_id = self._next_id
+        self._next_id += 1
+        timer = self._timers[timer_id] = _Timer(callback, interval, 0.0)
+        if self.suspended:
+            timer.due = ms / 1000
+        else:
+            timer.due = time.monotonic() + ms / 1000
+            self._schedule(timer_id, timer, ms)
+        return timer_id
+
+    def _schedule(self, timer_id, timer, ms):
+        timer.after_id = self.widget.after(ms, lambda: self._run(timer_id))
+
+    def _run(self, timer_id):
+        timer = self._timers.get(timer_id)
+        if timer is None:
+            return
+        timer.after_id = None
+        if timer.interval is None:
+            del self._timers[timer_id]
+        else:
+            timer.due = time.monotonic() + timer.interval / 1000
+            self._schedule(timer_id, timer, timer.interval)
+        timer.callback()
+
+
+class AppLifecycle:
+    """
+    Lifecycle hooks HomeOS calls on an app's frame.
+
+    Switching to an app calls on_resume() then on_show(); switching away
+    or closing it calls on_hide() then on_suspend(). The current app is
+    also suspended while the HomeOS window is minimized, and on_destroy()
+    is called before the frame is destroyed. Apps may define any of these
+    without using this mixin; HomeOS only calls the ones that exist.
+
+    Periodic work scheduled through `self.timers` rather than after() is
+    paused automatically while the app is suspended. Keyboard shortcuts
+    are bound through the KeyRouter passed to register_keys(), so they
+    only reach the app while it is shown. Apps overriding a hook should
+    call the base version.
+    """
+
+    @property
+    def timers(self):
+        timers = self.__dict__.get("_app_timers")
+        if timers is None:
+            timers = self.__dict__["_app_timers"] = AppTimers(self)
+        return timers
+
+    def register_keys(self, router):
+        """Called once, after the app is built, to bind its keys on the router."""
+        pass
+
+    def on_show(self):
+        pass
+
+    def on_hide(self):
+        pass
+
+    def on_suspend(self):
+        self.timers.suspend()
+
+    def on_resume(self):
+        self.timers.resume()
+
+    def on_destroy(self):
+        self.timers.cancel_all()
+
+
+def notify(app_frame, hook):
+    """Calls a lifecycle hook on an app's frame if it defines it."""
+    method = getattr(app_frame, hook, None)
+    if method is not None:
+        method()
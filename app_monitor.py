@@ -0,0 +1,389 @@
+import bisect
+import contextlib
+import os
+import sys
+import threading
+import time
+import tkinter as tk
+import traceback
+import tracemalloc
+from collections import deque
+from types import ModuleType
+
+import procstats
+from appdata import data_path
+
+# Row for callbacks and allocations that belong to no app
+DESKTOP = "desktop"
+
+# Upper bounds, in ms, of the callback latency histogram's buckets; the
+# last bucket holds everything slower
+LATENCY_BUCKETS_MS = (1, 4, 16, 50, 100, 250, 1000)
+
+
+class AppStats:
+    """Counters for the Tk callbacks attributed to one app."""
+
+    __slots__ = ("pending", "calls", "handler_time", "slowest", "latency")
+
+    def __init__(self):
+        self.pending = 0          # after() callbacks scheduled but not yet run
+        self.calls = 0            # Tk callbacks run
+        self.handler_time = 0.0   # Seconds spent in them, excluding nested callbacks
+        self.slowest = 0.0        # Longest single callback, in seconds
+        # Callbacks per LATENCY_BUCKETS_MS bucket, by how long each held the event loop
+        self.latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+
+class AppMonitor:
+    """
+    Attributes Tk callback time, pending after() callbacks and memory
+    allocations to the apps in `root.available_apps`.
+
+    Every Python callback Tk runs (bindings, widget commands, variable
+    traces and after() callbacks) goes through Misc._register, which is
+    wrapped once here to time it. A callback belongs to the app whose frame
+    contains the widget the callback is a method of, or failing that the
+    widget it was registered on; after() callbacks are charged to the app
+    that scheduled them. Allocations are only traced inside
+    tracing_allocations(), since tracing slows down every allocation.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.stats = {}
+        self.started = time.monotonic()
+        self._scheduled = {}      # after id -> AppStats of a pending callback
+        self._charge = None       # AppStats an after() callback asked to be charged to
+        self._nested_time = 0.0   # Time spent in callbacks run inside the current one
+        # [function, widget] of each callback running, outermost first
+        self.running = []
+        self.watchdog = None
+        self._tracers = 0         # Callers inside tracing_allocations()
+        self._started_tracing = False
+        self._tracers_lock = threading.Lock()
+        self._install()
+
+    def stats_for(self, name):
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = AppStats()
+        return stats
+
+    def owner_of(self, widget):
+        """Returns the name of the app whose frame contains a widget."""
+        path = str(widget)
+        for name, frame in getattr(self.root, "available_apps", {}).items():
+            frame_path = str(frame)
+            if path == frame_path or path.startswith(frame_path + "."):
+                return name
+        return DESKTOP
+
+    def _owner(self, func, widget):
+        target = getattr(func, "__self__", None)
+        return self.owner_of(target if isinstance(target, tk.Misc) else widget)
+
+    def running_handlers(self):
+        """Returns (app, handler name) for each callback running, outermost first."""
+        return [(self._owner(func, widget), describe_handler(func))
+                for func, widget in list(self.running)]
+
+    def start_watchdog(self, **options):
+        """Starts a StallWatchdog for the monitored window."""
+        self.watchdog = StallWatchdog(self, **options)
+        return self.watchdog
+
+    # --- Instrumentation ---
+
+    def _install(self):
+        monitor = self
+        register = tk.Misc._register
+        after = tk.Misc.after
+        after_cancel = tk.Misc.after_cancel
+
+        def timed_register(widget, func, subst=None, needcleanup=1):
+            return register(widget, monitor._timed(widget, func), subst, needcleanup)
+
+        def counted_after(widget, ms, func=None, *args):
+            if func is None:
+                return after(widget, ms)
+            stats = monitor.stats_for(monitor._owner(func, widget))
+
+            def scheduled(*call_args):
+                if monitor._scheduled.pop(after_id, None) is not None:
+                    stats.pending -= 1
+                monitor._charge = stats
+                if monitor.running:
+                    # Blame stalls on the function scheduled, not tkinter's wrapper
+                    monitor.running[-1][0] = func
+                return func(*call_args)
+
+            after_id = after(widget, ms, scheduled, *args)
+            monitor._scheduled[after_id] = stats
+            stats.pending += 1
+            return after_id
+
+        def counted_after_cancel(widget, after_id):
+            stats = monitor._scheduled.pop(after_id, None)
+            if stats is not None:
+                stats.pending -= 1
+            return after_cancel(widget, after_id)
+
+        tk.Misc._register = timed_register
+        tk.Misc.after = counted_after
+        tk.Misc.after_cancel = counted_after_cancel
+
+    def _timed(self, widget, func):
+        monitor = self
+
+        def timed(*args):
+            charge, nested = monitor._charge, monitor._nested_time
+            monitor._charge, monitor._nested_time = None, 0.0
+            monitor.running.append([func, widget])
+            start = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                elapsed = time.perf_counter() - start
+                monitor.running.pop()
+                own = elapsed - monitor._nested_time
+                stats = monitor._charge or monitor.stats_for(monitor._owner(func, widget))
+                monitor._charge, monitor._nested_time = charge, nested + elapsed
+                stats.calls += 1
+                stats.handler_time += own
+                stats.slowest = max(stats.slowest, own)
+                stats.latency[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed * 1000)] += 1
+
+        return timed
+
+    # --- Sampling ---
+
+    def sample(self, allocations=False):
+        """
+        Returns a row per app (every registered app, built or not, then any
+        other source of callbacks) as a dict of its current counters. Reads no Tk
+        state, so it is safe to call from a terminal worker thread.
+        """
+        apps = dict(getattr(self.root, "available_apps", {}))
+        registered = list(getattr(self.root, "registry", apps))
+        current = getattr(self.root, "current_frame", None)
+        allocated = self._allocations(apps) if allocations else None
+        rows = []
+        names = registered + [name for name in apps if name not in registered]
+        for name in names + sorted(set(self.stats) - set(names)):
+            stats = self.stats.get(name) or AppStats()
+            if name in apps:
+                state = "shown" if apps[name] is current else "hidden"
+            elif name in registered:
+                state = "unbuilt"
+            else:
+                state = "-"
+            rows.append({
+                "name": name, "state": state, "pending": stats.pending,
+                "calls": stats.calls, "handler_time": stats.handler_time,
+                "slowest": stats.slowest, "latency": list(stats.latency),
+                "allocated": allocated.get(name, 0) if allocated is not None else None,
+            })
+        return rows
+
+    @contextlib.contextmanager
+    def tracing_allocations(self):
+        """
+        Traces memory allocations for sample(allocations=True) while the
+        block runs, stopping once no caller needs them any more. Only
+        memory allocated while tracing is counted.
+        """
+        with self._tracers_lock:
+            self._tracers += 1
+            if self._tracers == 1:
+                # Leave tracing started by someone else, e.g. PYTHONTRACEMALLOC, running
+                self._started_tracing = not tracemalloc.is_tracing()
+                if self._started_tracing:
+                    tracemalloc.start(8)
+        try:
+            yield
+        finally:
+            with self._tracers_lock:
+                self._tracers -= 1
+                if not self._tracers and self._started_tracing:
+                    tracemalloc.stop()
+
+    def _allocations(self, apps):
+        """Returns the bytes currently allocated by each app's modules, or None if not tracing."""
+        if not tracemalloc.is_tracing():
+            return None
+        files = self._module_files(apps)
+        totals = {}
+        for statistic in tracemalloc.take_snapshot().statistics("traceback"):
+            # Charge the allocation to the innermost frame in an app module
+            for frame in statistic.traceback:
+                name = files.get(frame.filename)
+                if name is not None:
+                    totals[name] = totals.get(name, 0) + statistic.size
+                    break
+        return totals
+
+    @staticmethod
+    def _module_files(apps):
+        """
+        Maps the source file of every HomeOS module to an app: each app's
+        own module and the modules it imports from the project, with
+        shared ones going to the first app listed. Other project files
+        belong to the desktop.
+        """
+        directory = os.path.dirname(os.path.abspath(__file__))
+        # The monitor's own allocations are overhead, not the terminal's
+        files = {__file__: DESKTOP}
+        for name, frame in apps.items():
+            stack = [sys.modules.get(type(frame).__module__)]
+            while stack:
+                module = stack.pop()
+                path = getattr(module, "__file__", None)
+                if path is None or os.path.dirname(os.path.abspath(path)) != directory \
+                        or path in files:
+                    continue
+                files[path] = name
+                for value in vars(module).values():
+                    if not isinstance(value, ModuleType):
+                        value = sys.modules.get(getattr(value, "__module__", None))
+                    stack.append(value)
+        for module in list(sys.modules.values()):
+            path = getattr(module, "__file__", None)
+            if path is not None and os.path.dirname(os.path.abspath(path)) == directory:
+                files.setdefault(path, DESKTOP)
+        return files
+
+
+class Stall:
+    """A period the Tk event loop was blocked."""
+
+    def __init__(self, started, handlers, stack):
+        self.started = started    # time.monotonic() of the last heartbeat before it
+        self.wall_time = time.time()
+        self.duration = None      # Seconds, once the event loop is back
+        self.handlers = handlers  # (app, handler) running when the stack was sampled
+        self.stack = stack        # The main thread's stack at that moment, as text lines
+
+    def summary(self):
+        duration = f"{self.duration:.2f} s" if self.duration is not None else "ongoing"
+        if self.handlers:
+            app, handler = self.handlers[-1]
+            blame = f"{handler} ({app})"
+        else:
+            blame = "Tk itself (no Python callback running)"
+        return (f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.wall_time))} "
+                f"stall {duration} in {blame}")
+
+
+class StallWatchdog:
+    """
+    Detects stalls of the Tk event loop.
+
+    The event loop runs a heartbeat every INTERVAL seconds. A thread
+    checks on it, and once a heartbeat is THRESHOLD seconds late it samples
+    the main thread's stack and the callbacks the monitor sees running,
+    blaming the stall on the innermost one. When the heartbeat comes back
+    the stall is complete: it is kept in `stalls` and appended to
+    ~/.homeos/logs/stalls.log with its stack.
+    """
+
+    INTERVAL = 0.1
+    THRESHOLD = 0.25
+    HISTORY = 50
+
+    def __init__(self, monitor, threshold=None, log_path=None):
+        self.monitor = monitor
+        self.root = monitor.root
+        self.threshold = threshold if threshold is not None else self.THRESHOLD
+        self.log_path = log_path or data_path("logs", "stalls.log")
+        self.stalls = deque(maxlen=self.HISTORY)
+        self.last_beat = time.monotonic()
+        self._main_thread = threading.get_ident()
+        self._stall = None
+        self._stopped = threading.Event()
+
+        self.root.after(int(self.INTERVAL * 1000), self._beat)
+        self.root.bind("<Destroy>", self._destroyed, add="+")
+        threading.Thread(target=self._watch, name="stall-watchdog", daemon=True).start()
+
+    def _beat(self):
+        self.last_beat = time.monotonic()
+        if not self._stopped.is_set():
+            self.root.after(int(self.INTERVAL * 1000), self._beat)
+
+    def _destroyed(self, event):
+        if event.widget is self.root:
+            self._stopped.set()
+
+    def _watch(self):
+        while not self._stopped.wait(self.INTERVAL / 2):
+            beat = self.last_beat
+            if self._stall is None:
+                if time.monotonic() - beat > self.INTERVAL + self.threshold:
+                    self._stall = self._sample(beat)
+            elif beat > self._stall.started:
+                self._stall.duration = beat - self._stall.started - self.INTERVAL
+                self._record(self._stall)
+                self._stall = None
+
+    def _sample(self, started):
+        frame = sys._current_frames().get(self._main_thread)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        return Stall(started, self.monitor.running_handlers(), stack)
+
+    def _record(self, stall):
+        self.stalls.append(stall)
+        try:
+            with open(self.log_path, "a") as log:
+                log.write(stall.summary() + "\n")
+                log.write("".join(stall.stack) + "\n")
+        except OSError:
+            pass  # The stall is still listed by the terminal's 'stalls' command
+
+    def recent(self):
+        """Returns the recorded stalls, newest last, plus any still in progress."""
+        stalls = list(self.stalls)
+        if self._stall is not None:
+            stalls.append(self._stall)
+        return stalls
+
+
+def describe_handler(func):
+    """Returns a readable name for a callback, such as 'browser.BrowserApp.fetch_url'."""
+    func = getattr(func, "__func__", func)
+    name = getattr(func, "__qualname__", None) or type(func).__qualname__
+    module = getattr(func, "__module__", None)
+    return f"{module}.{name}" if module else name
+
+
+def format_latency(rows):
+    """Formats the latency histograms of sample() rows, one row per app with callbacks."""
+    bounds = [f"<{ms}ms" if ms < 1000 else f"<{ms // 1000}s" for ms in LATENCY_BUCKETS_MS]
+    bounds.append(f">={LATENCY_BUCKETS_MS[-1] // 1000}s")
+    lines = [f"{'APP':<10}" + "".join(f" {bound:>7}" for bound in bounds)]
+    for row in rows:
+        if row["calls"]:
+            lines.append(f"{row['name']:<10}" + "".join(f" {count:>7}" for count in row["latency"]))
+    return lines
+
+
+def format_table(rows, interval=None):
+    """
+    Formats sample() rows as a table. With an interval, `calls` and
+    `handler_time` are taken to be counts for that many seconds and a CPU
+    column shows the handler time as a share of it.
+    """
+    header = f"{'APP':<10} {'STATE':<7} {'PENDING':>7} {'CALLS':>7} {'HANDLER ms':>11} {'SLOWEST ms':>11}"
+    if interval:
+        header += f" {'CPU%':>6}"
+    header += f" {'ALLOCATED':>11}"
+    lines = [header]
+    for row in rows:
+        line = (f"{row['name']:<10} {row['state']:<7} {row['pending']:>7} {row['calls']:>7} "
+                f"{row['handler_time'] * 1000:>11.1f} {row['slowest'] * 1000:>11.1f}")
+        if interval:
+            line += f" {100 * row['handler_time'] / interval:>6.1f}"
+        allocated = row["allocated"]
+        line += f" {procstats.format_bytes(allocated) if allocated is not None else '-':>11}"
+        lines.append(line)
+    return lines
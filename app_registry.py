@@ -0,0 +1,106 @@
+import importlib
+import warnings
+from importlib import metadata
+
+# Entry point group third-party packages use to add apps to HomeOS
+ENTRY_POINT_GROUP = "homeos.apps"
+
+
+class AppSpec:
+    """
+    Describes an app HomeOS can launch, without importing it.
+
+    `target` is the app's frame class as a "module:ClassName" path; the
+    module is only imported when the app is first opened. `factory` builds
+    the frame as factory(cls, home, on_close); by default the class is
+    called as cls(home.container, on_close).
+    """
+
+    def __init__(self, name, title, icon, target, factory=None):
+        self.name = name
+        self.title = title
+        self.icon = icon
+        self.target = target
+        self.factory = factory
+
+    def __repr__(self):
+        return f"<AppSpec {self.name!r} {self.target!r}>"
+
+    def load(self):
+        """Imports the app's module and returns its frame class."""
+        module_name, _, attribute = self.target.partition(":")
+        return getattr(importlib.import_module(module_name), attribute)
+
+    def create(self, home, on_close):
+        """Imports and builds the app's frame inside a HomeOS window."""
+        cls = self.load()
+        if self.factory is not None:
+            return self.factory(cls, home, on_close)
+        return cls(home.container, on_close)
+
+
+class AppRegistry:
+    """
+    The apps installed in HomeOS, in the order they are listed.
+
+    Views such as the desktop and the start menu subscribe to it and are
+    told about each app added or removed, so they never need rebuilding.
+    """
+
+    def __init__(self):
+        self._apps = {}
+        self._listeners = []
+
+    def __iter__(self):
+        return iter(list(self._apps))
+
+    def __len__(self):
+        return len(self._apps)
+
+    def __contains__(self, name):
+        return name in self._apps
+
+    def get(self, name):
+        return self._apps.get(name)
+
+    def specs(self):
+        return list(self._apps.values())
+
+    def subscribe(self, listener):
+        """Calls listener(event, spec) with "added" or "removed" from now on."""
+        self._listeners.append(listener)
+
+    def register(self, spec):
+        """Adds an app, replacing any registered under the same name."""
+        if spec.name in self._apps:
+            self.unregister(spec.name)
+        self._apps[spec.name] = spec
+        for listener in list(self._listeners):
+            listener("added", spec)
+
+    def unregister(self, name):
+        spec = self._apps.pop(name, None)
+        if spec is not None:
+            for listener in list(self._listeners):
+                listener("removed", spec)
+        return spec
+
+    def discover(self, group=ENTRY_POINT_GROUP):
+        """
+        Registers the apps installed packages advertise under an entry
+        point group. Each entry point refers to an AppSpec, or to a
+        function returning one. A broken entry point is skipped with a
+        warning rather than keeping HomeOS from starting.
+        """
+        for entry_point in metadata.entry_points(group=group):
+            try:
+                spec = entry_point.load()
+                if not isinstance(spec, AppSpec):
+                    spec = spec()
+                if not isinstance(spec, AppSpec):
+                    raise TypeError(f"expected an AppSpec, got {type(spec).__name__}")
+            except Exception as e:
+                warnings.warn(f"Could not load HomeOS app '{entry_point.name}': {e}",
+                              RuntimeWarning)
+                continue
+            self.register(spec)
@@ -0,0 +1,15 @@
+import os
+
+
+def data_path(*parts):
+    """
+    Returns a path inside the HomeOS data directory, creating the parent
+    directory if needed.
+
+    The data directory is ~/.homeos, or $HOMEOS_DATA_DIR when it is set.
+    """
+    base = os.environ.get("HOMEOS_DATA_DIR") or os.path.join(
+        os.path.expanduser("~"), ".homeos")
+    path = os.path.join(base, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
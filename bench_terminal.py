@@ -0,0 +1,116 @@
+"""
+Benchmarks the terminal's shell core without a window.
+
+Builds virtual filesystems of increasing size and times common commands
+against each, reporting per-command latency and throughput:
+
+    python bench_terminal.py
+    python bench_terminal.py --sizes 1000 100000 --repeat 500
+"""
+import argparse
+import os
+import statistics
+import time
+from collections import deque
+
+from history import CommandHistory
+from shell import Shell
+
+# Entries per generated directory, and how many of them are subdirectories
+FANOUT = 32
+SUBDIRS = 8
+
+
+def build_tree(shell, size):
+    """
+    Fills the shell's filesystem with `size` nodes under /bench, breadth
+    first, and returns the path of the deepest directory created.
+    """
+    fs = shell.file_system
+    queue = deque([fs.mkdir("/bench")])
+    created = 0
+    deepest = queue[0]
+    while created < size:
+        parent = queue.popleft()
+        deepest = parent
+        for index in range(FANOUT):
+            if created >= size:
+                break
+            if index < SUBDIRS:
+                queue.append(fs.mkdir(f"dir_{created}", parent))
+            else:
+                fs.touch(f"file_{created}.txt", parent)
+            created += 1
+    return fs.path_of(deepest)
+
+
+def time_command(run, repeat, budget):
+    """
+    Calls run() up to `repeat` times and returns the latencies in seconds,
+    stopping early once `budget` seconds have been spent.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+        if sum(samples) > budget:
+            break
+    return samples
+
+
+def bench_size(size, repeat, budget):
+    shell = Shell("bench", lambda text: None,
+                  history=CommandHistory("bench", path=os.devnull))
+    start = time.perf_counter()
+    deep = build_tree(shell, size)
+    build_time = time.perf_counter() - start
+
+    shell.execute("cd /bench")
+    # The slow first builds of the indexes are not what's being measured
+    shell.execute("find /bench -name file_9.txt")
+    shell.file_system.completion_trie(shell.current_directory)
+
+    def cycle(*lines):
+        return lambda: [shell.execute(line) for line in lines]
+
+    cases = [
+        ("ls", cycle("ls")),
+        ("ls deep", cycle(f"ls {deep}")),
+        ("cd deep + cd /bench", cycle(f"cd {deep}", "cd /bench")),
+        ("cd dir + cd ..", cycle("cd dir_0", "cd ..")),
+        ("mkdir + rmdir", cycle("mkdir bench_tmp", "rmdir bench_tmp")),
+        ("touch + rm", cycle("touch bench_tmp.txt", "rm bench_tmp.txt")),
+        ("find -name exact", cycle(f"find /bench -name file_{size - 1}.txt")),
+        ("find -name glob", cycle("find /bench -name '*_99*.txt'")),
+        ("ls | wc -l", cycle("ls | wc -l")),
+        ("complete path", lambda: shell.complete("ls dir_1")),
+    ]
+
+    print(f"\n{size} nodes (built in {build_time:.2f} s)")
+    print(f"  {'command':<22}{'runs':>6}{'mean us':>12}{'p50 us':>12}{'p95 us':>12}{'ops/s':>10}")
+    for name, run in cases:
+        samples = sorted(time_command(run, repeat, budget))
+        mean = statistics.fmean(samples)
+        p50 = samples[len(samples) // 2]
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"  {name:<22}{len(samples):>6}{mean * 1e6:>12.1f}{p50 * 1e6:>12.1f}"
+              f"{p95 * 1e6:>12.1f}{1 / mean if mean else 0:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HomeOS shell core.")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6],
+                        help="filesystem sizes to test, in nodes")
+    parser.add_argument("--repeat", type=int, default=200,
+                        help="times each command is run per size")
+    parser.add_argument("--budget", type=float, default=2.0,
+                        help="seconds after which a slow command stops repeating")
+    args = parser.parse_args()
+    for size in args.sizes:
+        bench_size(size, args.repeat, args.budget)
+
+
+if __name__ == "__main__":
+    main()
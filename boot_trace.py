@@ -0,0 +1,173 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+import procstats
+from appdata import data_path
+
+# Set to 1 (or pass --boot-trace to login.py) to trace startup
+ENV_VAR = "HOMEOS_BOOT_TRACE"
+
+# The tracer for this process, or None when tracing is off
+tracer = None
+
+
+class BootTracer:
+    """
+    Records startup as spans in Chrome trace-event format.
+
+    Time 0 is when the process started, so the gap before the first span
+    is the interpreter's own startup. Spans are "complete" events with a
+    start and duration in microseconds; the trace can be opened in
+    chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter() - procstats.uptime_seconds()
+        self.events = []
+        self.path = None
+        self.finished = False
+        self.add_span("interpreter startup", "python", self.origin, time.perf_counter())
+
+    def add_span(self, name, category, start, end):
+        self.events.append({
+            "name": name, "cat": category, "ph": "X",
+            "ts": round((start - self.origin) * 1e6), "dur": round((end - start) * 1e6),
+            "pid": os.getpid(), "tid": threading.get_ident(),
+        })
+
+    def add_instant(self, name, category):
+        self.events.append({
+            "name": name, "cat": category, "ph": "i", "s": "p",
+            "ts": round((time.perf_counter() - self.origin) * 1e6),
+            "pid": os.getpid(), "tid": threading.get_ident(),
+        })
+
+    @contextlib.contextmanager
+    def span(self, name, category):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, time.perf_counter())
+
+    def to_json(self):
+        return json.dumps({"traceEvents": self.events, "displayTimeUnit": "ms"})
+
+    def write(self):
+        """Saves the trace to the data directory and returns its path."""
+        self.path = data_path("traces", time.strftime("boot-%Y%m%d-%H%M%S.json"))
+        with open(self.path, "w") as file:
+            file.write(self.to_json())
+        return self.path
+
+
+class _TimedLoader:
+    """Wraps a module loader to record how long the module takes to run."""
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def exec_module(self, module):
+        if tracer.finished:
+            self._loader.exec_module(module)
+            return
+        with tracer.span(f"import {module.__name__}", "import"):
+            self._loader.exec_module(module)
+
+
+class _ImportTimer:
+    """
+    A meta path finder that finds modules with the finders after it and
+    times their loading. Imports made while a module runs show up as
+    spans nested inside its own.
+    """
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                if hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+def enable_if_requested(argv):
+    """
+    Starts tracing if --boot-trace is in argv (removing it) or the
+    environment variable is set. Call before importing anything to be
+    timed.
+    """
+    global tracer
+    requested = "--boot-trace" in argv
+    if requested:
+        argv.remove("--boot-trace")
+    if tracer is None and (requested or os.environ.get(ENV_VAR) == "1"):
+        tracer = BootTracer()
+        sys.meta_path.insert(0, _ImportTimer())
+
+
+def span(name, category="startup"):
+    """A context manager recording a span, or doing nothing when tracing is off."""
+    if tracer is None or tracer.finished:
+        return contextlib.nullcontext()
+    return tracer.span(name, category)
+
+
+def first_paint(window, name, finish=False):
+    """
+    Records when a window is first drawn and when Tk next goes idle after
+    that. With finish=True, the trace is complete at that idle point and
+    is written out.
+    """
+    if tracer is None or tracer.finished:
+        return
+
+    def painted(event):
+        window.unbind("<Expose>", binding)
+        tracer.add_instant(f"first paint: {name}", "paint")
+        window.after_idle(idle)
+
+    def idle():
+        tracer.add_instant(f"idle: {name}", "idle")
+        if finish:
+            tracer.finished = True
+            try:
+                tracer.write()
+            except OSError:
+                pass  # The trace can still be seen with 'boot-trace'
+
+    binding = window.bind("<Expose>", painted, add="+")
+
+
+def format_timeline(events, minimum_ms=1.0):
+    """
+    Formats trace events as an indented timeline, one line per span of at
+    least `minimum_ms` plus every instant, in start order.
+    """
+    events = sorted(events, key=lambda event: (event["ts"], -event.get("dur", 0)))
+    lines = [f"{'START ms':>9} {'DURATION ms':>12}  EVENT"]
+    open_spans = {}  # thread -> end times of the spans enclosing the current one
+    for event in events:
+        stack = open_spans.setdefault(event["tid"], [])
+        while stack and stack[-1] <= event["ts"]:
+            stack.pop()
+        indent = "  " * len(stack)
+        if event["ph"] == "i":
+            lines.append(f"{event['ts'] / 1000:>9.1f} {'':>12}  {indent}* {event['name']}")
+            continue
+        stack.append(event["ts"] + event["dur"])
+        if event["dur"] / 1000 >= minimum_ms:
+            lines.append(f"{event['ts'] / 1000:>9.1f} {event['dur'] / 1000:>12.1f}  "
+                         f"{indent}{event['name']}")
+    return lines
@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import messagebox
+import styles
 import requests
 
 
@@ -18,7 +19,7 @@ class BrowserApp(tk.Frame):
 
         self.url_entry = tk.Entry(
             self.url_frame,
-            font=("Helvetica", 12),
+            font=styles.preset(self, "body"),
             bg="#212121",
             fg="#ffffff",
             insertbackground="#ffffff"
@@ -30,7 +31,7 @@ class BrowserApp(tk.Frame):
             self.url_frame,
             text="Go",
             command=self.fetch_url,
-            font=("Helvetica", 12),
+            font=styles.preset(self, "body"),
             bg="#27ae60",
             fg="#ffffff"
         )
@@ -43,7 +44,7 @@ class BrowserApp(tk.Frame):
             self.browser_frame,
             bg="#1e1e1e",
             fg="#d4d4d4",
-            font=("Consolas", 12),
+            font=styles.preset(self, "monospace"),
             wrap="word"
         )
         self.text_display.pack(fill="both", expand=True)
@@ -52,7 +53,7 @@ class BrowserApp(tk.Frame):
             self,
             text="Exit Browser",
             command=self.on_close,
-            font=("Helvetica", 12),
+            font=styles.preset(self, "body"),
             bg="#e74c3c",
             fg="#ffffff",
             relief="raised",
@@ -0,0 +1,137 @@
+class ParseError(Exception):
+    """Raised when a command line is not valid shell syntax."""
+
+
+class Command:
+    """One stage of a pipeline: its argument vector and any redirections."""
+
+    def __init__(self):
+        self.argv = []
+        self.stdin = None      # Path for '<'
+        self.stdout = None     # Path for '>' or '>>'
+        self.append = False    # True for '>>'
+
+    def __repr__(self):
+        return f"<Command {self.argv!r} <{self.stdin!r} >{self.stdout!r}>"
+
+
+class Pipeline:
+    """A parsed command line: commands joined by '|', optionally run with '&'."""
+
+    def __init__(self, commands, background=False):
+        self.commands = commands
+        self.background = background
+
+    def __repr__(self):
+        return f"<Pipeline {self.commands!r} background={self.background}>"
+
+
+OPERATORS = ("|", "&", "<", ">", ">>")
+
+
+def tokenize(line):
+    """
+    Splits a command line into ("word", text) and ("op", operator) tokens.
+
+    Supports single quotes, double quotes and backslash escapes, so quoted
+    operators such as '|' are kept as ordinary words.
+    """
+    tokens = []
+    word = []
+    in_word = False
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if char.isspace():
+            if in_word:
+                tokens.append(("word", "".join(word)))
+                word, in_word = [], False
+            i += 1
+        elif char in "|&<>":
+            if in_word:
+                tokens.append(("word", "".join(word)))
+                word, in_word = [], False
+            if line.startswith(">>", i):
+                tokens.append(("op", ">>"))
+                i += 2
+            else:
+                tokens.append(("op", char))
+                i += 1
+        elif char == "'":
+            end = line.find("'", i + 1)
+            if end == -1:
+                raise ParseError("unexpected end of line while looking for matching `''")
+            word.append(line[i + 1:end])
+            in_word = True
+            i = end + 1
+        elif char == '"':
+            i += 1
+            while i < len(line) and line[i] != '"':
+                if line[i] == "\\" and i + 1 < len(line) and line[i + 1] in '"\\$`':
+                    i += 1
+                word.append(line[i])
+                i += 1
+            if i >= len(line):
+                raise ParseError("unexpected end of line while looking for matching `\"'")
+            in_word = True
+            i += 1
+        elif char == "\\" and i + 1 < len(line):
+            word.append(line[i + 1])
+            in_word = True
+            i += 2
+        else:
+            word.append(char)
+            in_word = True
+            i += 1
+    if in_word:
+        tokens.append(("word", "".join(word)))
+    return tokens
+
+
+def parse(line):
+    """
+    Parses a command line into a Pipeline.
+
+    Grammar:
+        pipeline := command ('|' command)* ['&']
+        command  := (word | redirect)+
+        redirect := ('<' | '>' | '>>') word
+    """
+    tokens = tokenize(line)
+    commands = [Command()]
+    background = False
+    i = 0
+    while i < len(tokens):
+        kind, value = tokens[i]
+        current = commands[-1]
+        if background:
+            raise ParseError(f"syntax error near unexpected token `{value}'")
+        if kind == "word":
+            current.argv.append(value)
+        elif value == "|":
+            if not current.argv:
+                raise ParseError("syntax error near unexpected token `|'")
+            commands.append(Command())
+        elif value == "&":
+            if not current.argv:
+                raise ParseError("syntax error near unexpected token `&'")
+            background = True
+        else:
+            if i + 1 >= len(tokens) or tokens[i + 1][0] != "word":
+                following = tokens[i + 1][1] if i + 1 < len(tokens) else "newline"
+                raise ParseError(f"syntax error near unexpected token `{following}'")
+            target = tokens[i + 1][1]
+            if value == "<":
+                current.stdin = target
+            else:
+                current.stdout = target
+                current.append = value == ">>"
+            i += 1
+        i += 1
+
+    if not commands[-1].argv:
+        if len(commands) > 1:
+            raise ParseError("syntax error near unexpected token `newline'")
+        if commands[-1].stdin or commands[-1].stdout:
+            raise ParseError("syntax error: redirection without a command")
+    return Pipeline(commands, background)
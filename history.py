@@ -0,0 +1,101 @@
+import os
+from urllib.parse import quote
+
+from appdata import data_path
+from trigram import TrigramIndex
+
+
+class CommandHistory:
+    """
+    A per-user command history backed by an append-only log file.
+
+    Commands are appended to the log as they are run, but the log is only
+    read the first time the history is browsed or searched. Once the log
+    holds more than `max_entries` commands (plus some slack, so compaction
+    is rare) it is rewritten with just the newest ones.
+    """
+
+    COMPACT_SLACK = 1.25
+
+    def __init__(self, username, max_entries=100000, path=None):
+        self.path = path or data_path("history", f"{quote(username, safe='')}.log")
+        self.max_entries = max_entries
+        self._entries = None
+        self._index = None
+
+    @property
+    def entries(self):
+        """The list of saved commands, oldest first, loaded on first use."""
+        if self._entries is None:
+            self._load()
+        return self._entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, position):
+        return self.entries[position]
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = [line.rstrip("\n") for line in f if line.strip()]
+        except OSError:
+            self._entries = []
+        if len(self._entries) > self.max_entries:
+            self._compact()
+
+    def _compact(self):
+        """Keeps only the newest entries and rewrites the log with them."""
+        del self._entries[:-self.max_entries]
+        self._index = None
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.writelines(f"{entry}\n" for entry in self._entries)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass  # History is best effort; keep the longer log
+
+    def append(self, command):
+        """Records a command, skipping immediate repeats of the last one."""
+        if self._entries is not None and self._entries and self._entries[-1] == command:
+            return
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(f"{command}\n")
+        except OSError:
+            pass
+
+        if self._entries is None:
+            return
+        self._entries.append(command)
+        if self._index is not None:
+            self._index.add(len(self._entries) - 1, command)
+        if len(self._entries) > self.max_entries * self.COMPACT_SLACK:
+            self._compact()
+
+    def search(self, query):
+        """
+        Yields distinct commands containing the query, newest first.
+
+        Queries of three or more characters are answered from a trigram
+        index that is built on the first search; shorter ones scan
+        backwards, which finds a match almost immediately in practice.
+        """
+        entries = self.entries
+        if TrigramIndex.searchable(query):
+            if self._index is None:
+                self._index = TrigramIndex()
+                for position, entry in enumerate(entries):
+                    self._index.add(position, entry)
+            positions = self._index.candidates(query)
+        else:
+            positions = range(len(entries) - 1, -1, -1)
+
+        seen = set()
+        for position in positions:
+            entry = entries[position]
+            if query in entry and entry not in seen:
+                seen.add(entry)
+                yield entry
@@ -1,114 +1,148 @@
+import os
 import tkinter as tk
 from tkinter import messagebox
-from terminal import TerminalApp
-from pydocs import PydocsApp
-from snake import SnakeGame
-from browser import BrowserApp
-
-
-class Desktop(tk.Frame):
+import boot_trace
+import styles
+from app_lifecycle import notify
+from app_monitor import AppMonitor
+from app_registry import AppRegistry, AppSpec
+from key_router import KeyRouter
+
+
+BUILTIN_APPS = [
+    AppSpec("terminal", "Terminal", "\uf120", "terminal:TerminalApp",
+            lambda cls, home, on_close: cls(home.container, on_close, home.username,
+                                            home.show_app, home.monitor)),
+    AppSpec("pydocs", "Pydocs", "✎", "pydocs:PydocsApp",
+            lambda cls, home, on_close: cls(home.container, on_close,
+                                            home.change_desktop_color)),
+    AppSpec("snake", "Snake", "\uf11b", "snake:SnakeGame"),
+    AppSpec("browser", "Browser", "🌐", "browser:BrowserApp"),
+]
+
+
+class Desktop(tk.Canvas):
     """
-    The main desktop area where application icons would reside.
+    The main desktop area where application icons reside.
+
+    The desktop is a single Canvas and each icon is a glyph and a caption
+    drawn on it, tagged with the app's name. There is one icon per app in
+    the registry; icons are added and removed as apps are registered and
+    unregistered.
     """
 
-    def __init__(self, master, launch_app_callback, username):
-        super().__init__(master, bg="#212121")  # Dark background
+    # Icons are laid out in columns of this many, ICON_SPACING pixels apart
+    ICONS_PER_COLUMN = 8
+    ICON_SPACING = (100, 80)
+    # Pointer movement, in pixels, before a press becomes a drag
+    DRAG_THRESHOLD = 5
+    # Minimum time between moves of a dragged icon (about one per frame)
+    DRAG_INTERVAL_MS = 16
+
+    def __init__(self, master, launch_app_callback, username, registry):
+        super().__init__(master, bg="#212121", highlightthickness=0)  # Dark background
         self.launch_app_callback = launch_app_callback
         self.username = username
-
-        # A frame to hold desktop icons
-        self.icons_frame = tk.Frame(self, bg="#212121")
-        self.icons_frame.pack(fill="both", expand=True)
-
-        # Desktop icon for Terminal
-        self.terminal_icon = self._create_icon(
-            self.icons_frame,
-            "Terminal",
-            "",  # Unicode for terminal icon
-            lambda: self.launch_app_callback("terminal")
-        )
-        self.terminal_icon.place(x=20, y=20)
-
-        # Desktop icon for Pydocs
-        self.pydocs_icon = self._create_icon(
-            self.icons_frame,
-            "Pydocs",
-            "✎",  # A new Unicode character for a better icon
-            lambda: self.launch_app_callback("pydocs")
-        )
-        self.pydocs_icon.place(x=20, y=100)
-
-        # Desktop icon for Snake Game
-        self.snake_icon = self._create_icon(
-            self.icons_frame,
-            "Snake",
-            "",  # Unicode for a game controller
-            lambda: self.launch_app_callback("snake")
-        )
-        self.snake_icon.place(x=20, y=180)
-
-        # Desktop icon for Web Browser
-        self.browser_icon = self._create_icon(
-            self.icons_frame,
-            "Browser",
-            "🌐",  # A new Unicode character for a better browser icon
-            lambda: self.launch_app_callback("browser")
-        )
-        self.browser_icon.place(x=20, y=260)
-
-    def _create_icon(self, parent, text, icon_char, command):
-        """Helper method to create a button that looks like a desktop icon."""
-        frame = tk.Frame(parent, bg="#212121")  # Dark background
-        icon_font = "FontAwesome" if "FontAwesome" in tk.font.families() else "Arial"
-
-        icon_label = tk.Label(
-            frame,
-            text=icon_char,
-            font=(icon_font, 36),
-            fg="#90caf9",  # Light blue accent color
-            bg="#212121",
-            cursor="hand2"
-        )
-        icon_label.pack()
-        label = tk.Label(frame, text=text, fg="#ffffff",
-                         bg="#212121", font=("Helvetica", 10))
-        label.pack()
-
-        # Make the icon clickable and draggable
-        frame.icon_command = command
-        frame.bind("<Button-1>", self._start_drag)
-        frame.bind("<B1-Motion>", self._drag_motion)
-        frame.bind("<ButtonRelease-1>", self._stop_drag)
-        icon_label.bind("<Button-1>", self._start_drag)
-        icon_label.bind("<B1-Motion>", self._drag_motion)
-        icon_label.bind("<ButtonRelease-1>", self._stop_drag)
-        label.bind("<Button-1>", self._start_drag)
-        label.bind("<B1-Motion>", self._drag_motion)
-        label.bind("<ButtonRelease-1>", self._stop_drag)
-
-        return frame
+        self.icons = {}
+        self._next_slot = 0
+        # Resolved once, without listing every font family
+        cache = styles.cache_for(self)
+        self.icon_font = cache.font(
+            "FontAwesome" if cache.has_family("FontAwesome") else "Arial", 36)
+
+        # The icon being pressed or dragged, where the pointer was last
+        # moved to, and where the icon has been drawn up to
+        self._drag = None
+
+        self.tag_bind("icon", "<Button-1>", self._start_drag)
+        self.tag_bind("icon", "<B1-Motion>", self._drag_motion)
+        self.tag_bind("icon", "<ButtonRelease-1>", self._stop_drag)
+        self.tag_bind("icon", "<Enter>", lambda event: self.config(cursor="hand2"))
+        self.tag_bind("icon", "<Leave>", lambda event: self.config(cursor=""))
+
+        for spec in registry.specs():
+            self.add_icon(spec)
+        registry.subscribe(self._registry_changed)
+
+    def _registry_changed(self, event, spec):
+        if event == "added":
+            self.add_icon(spec)
+        else:
+            self.remove_icon(spec.name)
+
+    def add_icon(self, spec):
+        """Draws an icon for an app in the next free slot."""
+        column, row = divmod(self._next_slot, self.ICONS_PER_COLUMN)
+        x = 20 + column * self.ICON_SPACING[0] + self.ICON_SPACING[0] // 2
+        y = 20 + row * self.ICON_SPACING[1]
+        self._next_slot += 1
+        tags = ("icon", f"app:{spec.name}")
+        self.create_text(x, y, text=spec.icon, font=self.icon_font,
+                         fill="#90caf9", anchor="n", tags=tags)  # Light blue accent color
+        self.create_text(x, y + 52, text=spec.title, font=styles.preset(self, "small"),
+                         fill="#ffffff", anchor="n", tags=tags)
+        self.icons[spec.name] = tags[1]
+
+    def remove_icon(self, name):
+        tag = self.icons.pop(name, None)
+        if tag is not None:
+            self.delete(tag)
+            if self._drag is not None and self._drag["tag"] == tag:
+                self._drag = None
+
+    def _icon_at_pointer(self):
+        for tag in self.gettags("current"):
+            if tag.startswith("app:"):
+                return tag
+        return None
 
     def _start_drag(self, event):
-        # Set a flag to check if the user is dragging
-        event.widget.master.drag_start_x = event.x
-        event.widget.master.drag_start_y = event.y
-        event.widget.master.is_dragging = False
+        tag = self._icon_at_pointer()
+        if tag is None:
+            return
+        self.tag_raise(tag)
+        self._drag = {"tag": tag, "start": (event.x, event.y), "drawn": (event.x, event.y),
+                      "pointer": (event.x, event.y), "dragging": False, "pending": None}
 
     def _drag_motion(self, event):
-        # Check if the drag distance is significant enough to be a drag
-        frame = event.widget.master
-        if abs(event.x - frame.drag_start_x) > 5 or abs(event.y - frame.drag_start_y) > 5:
-            frame.is_dragging = True
-            x, y = frame.winfo_x(), frame.winfo_y()
-            frame.place(x=x + event.x - frame.drag_start_x,
-                        y=y + event.y - frame.drag_start_y)
+        # Motion events can arrive far faster than the screen refreshes, so
+        # only the latest position is kept and the icon is moved at most
+        # once per DRAG_INTERVAL_MS
+        drag = self._drag
+        if drag is None:
+            return
+        drag["pointer"] = (event.x, event.y)
+        if not drag["dragging"]:
+            start_x, start_y = drag["start"]
+            if abs(event.x - start_x) <= self.DRAG_THRESHOLD \
+                    and abs(event.y - start_y) <= self.DRAG_THRESHOLD:
+                return
+            drag["dragging"] = True
+        if drag["pending"] is None:
+            drag["pending"] = self.after(self.DRAG_INTERVAL_MS, self._move_dragged)
+
+    def _move_dragged(self):
+        drag = self._drag
+        if drag is None:
+            return
+        drag["pending"] = None
+        (x, y), (drawn_x, drawn_y) = drag["pointer"], drag["drawn"]
+        self.move(drag["tag"], x - drawn_x, y - drawn_y)
+        drag["drawn"] = (x, y)
 
     def _stop_drag(self, event):
-        frame = event.widget.master
-        if not frame.is_dragging:
-            # If not dragging, execute the command
-            frame.icon_command()
-        frame.is_dragging = False
+        drag, self._drag = self._drag, None
+        if drag is None:
+            return
+        if drag["pending"] is not None:
+            self.after_cancel(drag["pending"])
+        if drag["dragging"]:
+            # Put the icon exactly where it was let go
+            drawn_x, drawn_y = drag["drawn"]
+            self.move(drag["tag"], event.x - drawn_x, event.y - drawn_y)
+        else:
+            # If not dragging, launch the app
+            self.launch_app_callback(drag["tag"][len("app:"):])
 
 
 class Taskbar(tk.Frame):
@@ -128,7 +162,7 @@ class Taskbar(tk.Frame):
             self,
             text="Start",
             command=start_menu_callback,
-            font=("Helvetica", 12, "bold"),
+            font=styles.preset(self, "body-bold"),
             bg="#424242",  # Darker accent
             fg="#ffffff",
             activebackground="#616161",
@@ -144,7 +178,7 @@ class Taskbar(tk.Frame):
                 self,
                 text=app_name,
                 command=command,
-                font=("Helvetica", 12),
+                font=styles.preset(self, "body"),
                 bg="#424242",
                 fg="#ffffff",
                 activebackground="#616161",
@@ -165,10 +199,30 @@ class Taskbar(tk.Frame):
 class HomeOS(tk.Tk):
     """
     The main application class that manages the different screens.
+
+    Apps are built the first time they are shown, and their modules are only
+    imported then, so logging in doesn't pay for apps that are never opened.
+    With prewarming on, the remaining apps are built one at a time while
+    the desktop is idle instead.
     """
 
-    def __init__(self, username):
+    # Delay before each prewarmed app is built, in ms
+    PREWARM_DELAY_MS = 500
+
+    def __init__(self, username, prewarm=None):
+        """
+        Initializes the desktop.
+
+        Args:
+            username (str): The logged-in username.
+            prewarm (bool): Build the apps in the background once the
+                desktop is idle. Defaults to the HOMEOS_PREWARM environment
+                variable being set to 1.
+        """
         super().__init__()
+        # Installed first so every app's callbacks are attributed to it
+        self.monitor = AppMonitor(self)
+        self.monitor.start_watchdog()
         self.username = username
         self.title(f"HomeOS - Logged in as {self.username}")
         self.geometry("1024x768")
@@ -183,30 +237,29 @@ class HomeOS(tk.Tk):
         self.taskbar = Taskbar(self, self.show_start_menu)
         self.taskbar.pack(side="bottom", fill="x")
 
+        # The installed apps: the built-in ones, then any provided by other
+        # packages. Apps are only imported and built when first opened.
+        self.registry = AppRegistry()
+        for spec in BUILTIN_APPS:
+            self.registry.register(spec)
+        with boot_trace.span("discover apps"):
+            self.registry.discover()
+
         # Create all frames/screens
-        self.desktop_screen = Desktop(
-            self.container, self.show_app, self.username)
+        with boot_trace.span("Desktop.__init__"):
+            self.desktop_screen = Desktop(
+                self.container, self.show_app, self.username, self.registry)
         self.start_menu_frame = tk.Frame(
             self.container, bg="#303030", width=200)  # Slightly lighter dark gray
         self.start_menu_frame.pack_propagate(False)
+        self.start_menu_buttons = {}
+        for spec in self.registry.specs():
+            self._add_start_menu_button(spec)
+        self.registry.subscribe(self._registry_changed)
 
-        # Initialize applications but don't display them yet
-        self.terminal_app = TerminalApp(self.container, lambda: self.close_app(
-            "terminal"), self.username, self.show_app)
-        self.pydocs_app = PydocsApp(self.container, lambda: self.close_app(
-            "pydocs"), self.change_desktop_color)
-        self.snake_app = SnakeGame(
-            self.container, lambda: self.close_app("snake"))
-        self.browser_app = BrowserApp(
-            self.container, lambda: self.close_app("browser"))
-
-        # A dictionary to hold all available apps for easier management
-        self.available_apps = {
-            "terminal": self.terminal_app,
-            "pydocs": self.pydocs_app,
-            "snake": self.snake_app,
-            "browser": self.browser_app
-        }
+        self.available_apps = {}
+        # Key presses go to the app shown, through the tables apps register
+        self.key_router = KeyRouter(self, lambda: self.current_frame)
 
         # Initially, show the desktop screen
         self.desktop_screen.pack(fill="both", expand=True)
@@ -214,6 +267,60 @@ class HomeOS(tk.Tk):
         self.taskbar.pack(side="bottom", fill="x")
 
         self.bind('<Escape>', self.quit_app)
+        self.protocol("WM_DELETE_WINDOW", self.quit_app)
+        # The current app is suspended while the window is minimized
+        self._minimized = False
+        self.bind("<Unmap>", self._window_mapped, add="+")
+        self.bind("<Map>", self._window_mapped, add="+")
+        boot_trace.first_paint(self, "desktop", finish=True)
+
+        # Ready for the first app that lists fonts, without slowing startup
+        styles.cache_for(self).prefetch(self.PREWARM_DELAY_MS)
+
+        if prewarm is None:
+            prewarm = os.environ.get("HOMEOS_PREWARM") == "1"
+        if prewarm:
+            self.after(self.PREWARM_DELAY_MS, self._prewarm_next)
+
+    # --- Apps ---
+
+    def get_app(self, app_name):
+        """Returns an app's frame, importing and building it on first use."""
+        app_frame = self.available_apps.get(app_name)
+        spec = self.registry.get(app_name)
+        if app_frame is None and spec is not None:
+            with boot_trace.span(f"build {app_name}", "app"):
+                app_frame = self.available_apps[app_name] = spec.create(
+                    self, lambda: self.close_app(app_name))
+            register_keys = getattr(app_frame, "register_keys", None)
+            if register_keys is not None:
+                register_keys(self.key_router)
+        return app_frame
+
+    def _registry_changed(self, event, spec):
+        if event == "added":
+            self._add_start_menu_button(spec)
+            return
+        button = self.start_menu_buttons.pop(spec.name, None)
+        if button is not None:
+            button.destroy()
+        app_frame = self.available_apps.pop(spec.name, None)
+        if app_frame is not None:
+            if app_frame is self.current_frame:
+                self.show_desktop()
+            self.taskbar.remove_app_button(spec.name)
+            self.key_router.remove_app(app_frame)
+            notify(app_frame, "on_destroy")
+            app_frame.destroy()
+
+    def _prewarm_next(self):
+        """Builds one app that hasn't been opened yet, then waits for the next idle slot."""
+        for app_name in self.registry:
+            if app_name not in self.available_apps:
+                self.get_app(app_name)
+                self.after(self.PREWARM_DELAY_MS,
+                           lambda: self.after_idle(self._prewarm_next))
+                return
 
     def change_desktop_color(self, color_code):
         """Changes the background color of the desktop and container frames."""
@@ -222,10 +329,10 @@ class HomeOS(tk.Tk):
 
     def show_desktop(self):
         """Displays the main desktop, called from the taskbar."""
-        if self.current_frame:
-            self.current_frame.pack_forget()
+        self._hide_current()
         self.desktop_screen.pack(fill="both", expand=True)
         self.current_frame = self.desktop_screen
+        self.desktop_screen.focus_set()
         self.taskbar.pack(side="bottom", fill="x")
 
     def show_start_menu(self):
@@ -234,94 +341,73 @@ class HomeOS(tk.Tk):
             self.start_menu_frame.pack_forget()
         else:
             self.start_menu_frame.pack(side="left", fill="y", anchor="sw")
-            self._populate_start_menu()
-
-    def _populate_start_menu(self):
-        """
-        Creates buttons in the start menu for each available application.
-        This is a simple version, for more apps you might want to use a loop.
-        """
-        for widget in self.start_menu_frame.winfo_children():
-            widget.destroy()
-
-        # Terminal app button
-        tk.Button(
-            self.start_menu_frame,
-            text="Terminal",
-            command=lambda: self.show_app("terminal"),
-            font=("Helvetica", 12),
-            bg="#424242",
-            fg="#ffffff",
-            activebackground="#616161",
-            activeforeground="#ffffff",
-            relief="flat"
-        ).pack(fill="x", padx=5, pady=2)
 
-        # Pydocs app button
-        tk.Button(
+    def _add_start_menu_button(self, spec):
+        """Adds an app's button to the bottom of the start menu."""
+        button = tk.Button(
             self.start_menu_frame,
-            text="Pydocs",
-            command=lambda: self.show_app("pydocs"),
-            font=("Helvetica", 12),
+            text=spec.title,
+            command=lambda: self.show_app(spec.name),
+            font=styles.preset(self, "body"),
             bg="#424242",
             fg="#ffffff",
             activebackground="#616161",
             activeforeground="#ffffff",
             relief="flat"
-        ).pack(fill="x", padx=5, pady=2)
-
-        # Snake game button
-        tk.Button(
-            self.start_menu_frame,
-            text="Snake",
-            command=lambda: self.show_app("snake"),
-            font=("Helvetica", 12),
-            bg="#424242",
-            fg="#ffffff",
-            activebackground="#616161",
-            activeforeground="#ffffff",
-            relief="flat"
-        ).pack(fill="x", padx=5, pady=2)
-
-        # Browser app button
-        tk.Button(
-            self.start_menu_frame,
-            text="Browser",
-            command=lambda: self.show_app("browser"),
-            font=("Helvetica", 12),
-            bg="#424242",
-            fg="#ffffff",
-            activebackground="#616161",
-            activeforeground="#ffffff",
-            relief="flat"
-        ).pack(fill="x", padx=5, pady=2)
+        )
+        button.pack(fill="x", padx=5, pady=2)
+        self.start_menu_buttons[spec.name] = button
 
     def show_app(self, app_name):
         """Switches the view to the specified application."""
+        app_frame = self.get_app(app_name)  # Built before anything is hidden
         self.start_menu_frame.pack_forget()  # Close the start menu if open
-        if self.current_frame:
-            self.current_frame.pack_forget()
-
-        app_frame = self.available_apps.get(app_name)
+        if app_frame is None:
+            return
 
-        if app_frame:
+        if app_frame is not self.current_frame:
+            self._hide_current()
             app_frame.pack(fill="both", expand=True)
             self.current_frame = app_frame
-            if app_name == "terminal":
-                self.terminal_app._refocus_input()
-            self.taskbar.add_app_button(
-                app_name, lambda: self.show_app(app_name))
+            # Away from any widget of the app just hidden, so its key
+            # bindings can't swallow this app's keys
+            app_frame.focus_set()
+            notify(app_frame, "on_resume")
+            notify(app_frame, "on_show")
+        self.taskbar.add_app_button(
+            app_name, lambda: self.show_app(app_name))
+
+    def _hide_current(self):
+        """Hides the current frame, suspending it if it is an app."""
+        frame = self.current_frame
+        if frame is None:
+            return
+        frame.pack_forget()
+        self.current_frame = None
+        if frame is not self.desktop_screen:
+            notify(frame, "on_hide")
+            notify(frame, "on_suspend")
+
+    def _window_mapped(self, event):
+        if event.widget is not self:
+            return
+        minimized = event.type == tk.EventType.Unmap
+        if minimized == self._minimized:
+            return
+        self._minimized = minimized
+        if self.current_frame is not None and self.current_frame is not self.desktop_screen:
+            notify(self.current_frame, "on_suspend" if minimized else "on_resume")
 
     def close_app(self, app_name):
         """Closes an application and returns to the desktop."""
-        app_frame = self.available_apps.get(app_name)
-        if app_frame:
-            app_frame.pack_forget()
+        if app_name in self.available_apps:
             self.taskbar.remove_app_button(app_name)
         self.show_desktop()
 
     def quit_app(self, event=None):
         """Method to quit the application."""
+        for app_frame in self.available_apps.values():
+            notify(app_frame, "on_destroy")
         self.destroy()
 
 
@@ -0,0 +1,55 @@
+class KeyRouter:
+    """
+    Sends key events to the app that is currently shown.
+
+    Each app has its own table of key sequences and handlers. The router
+    binds each sequence once, on the window itself, and looks the handler
+    up in the current app's table, so a hidden app never sees a key press
+    and bind_all is never needed. Keys bound by the focused widget and
+    ending in "break" (such as the terminal's Up and Down) never reach
+    the router.
+
+    A coalesced handler is for apps that only care about the latest state
+    of the keyboard: key presses and auto-repeats that arrive before Tk
+    next goes idle are merged into a single call with the newest event.
+    """
+
+    def __init__(self, window, current_app):
+        self.window = window
+        self.current_app = current_app  # Returns the frame of the app shown
+        self._tables = {}               # app frame -> {sequence: (handler, coalesce)}
+        self._bound = set()
+        self._pending = {}              # coalesced handler -> newest event
+
+    def bind(self, app, sequence, handler, coalesce=False):
+        """Calls handler(event) for `sequence` while `app` is the app shown."""
+        self._tables.setdefault(app, {})[sequence] = (handler, coalesce)
+        if sequence not in self._bound:
+            self.window.bind(
+                sequence, lambda event: self._dispatch(sequence, event), add="+")
+            self._bound.add(sequence)
+
+    def unbind(self, app, sequence):
+        self._tables.get(app, {}).pop(sequence, None)
+
+    def remove_app(self, app):
+        """Forgets all of an app's keys, e.g. before it is destroyed."""
+        for handler, coalesce in self._tables.pop(app, {}).values():
+            self._pending.pop(handler, None)
+
+    def _dispatch(self, sequence, event):
+        binding = self._tables.get(self.current_app(), {}).get(sequence)
+        if binding is None:
+            return None
+        handler, coalesce = binding
+        if not coalesce:
+            return handler(event)
+        if handler not in self._pending:
+            self.window.after_idle(lambda: self._deliver(handler))
+        self._pending[handler] = event
+        return "break"
+
+    def _deliver(self, handler):
+        event = self._pending.pop(handler, None)
+        if event is not None:
+            handler(event)
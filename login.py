@@ -1,9 +1,56 @@
+import sys
+import boot_trace
+# Before the other imports, so they are timed when tracing startup
+boot_trace.enable_if_requested(sys.argv)
 import tkinter as tk
 from tkinter import messagebox
+import styles
 import hashlib
+import passwords
+from accounts import AccountStore
+from concurrent.futures import ThreadPoolExecutor
 from home import HomeOS
 
 
+class PasswordWorker:
+    """
+    Hashes and checks passwords on a worker thread.
+
+    The KDF is slow on purpose, so it never runs on the Tk thread: while
+    a job runs, the window's buttons are disabled and a spinner turns in a
+    label, and the job's result is handed back on the Tk thread by an
+    after() poll. On the first run on a host, the KDF's cost is calibrated
+    before any job runs.
+    """
+
+    SPINNER = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏"
+    POLL_MS = 80
+
+    def __init__(self, window):
+        self.window = window
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="password")
+        if not passwords.is_calibrated():
+            self._executor.submit(passwords.calibrate)
+
+    def run(self, work, done, label, buttons, message):
+        """Runs work() on the worker, then done(result) on the Tk thread."""
+        future = self._executor.submit(work)
+        for button in buttons:
+            button.config(state="disabled")
+        self._poll(future, done, label, buttons, message, label.cget("fg"), 0)
+
+    def _poll(self, future, done, label, buttons, message, color, frame):
+        if not future.done():
+            label.config(text=f"{self.SPINNER[frame % len(self.SPINNER)]} {message}", fg="#ecf0f1")
+            self.window.after(self.POLL_MS, lambda: self._poll(
+                future, done, label, buttons, message, color, frame + 1))
+            return
+        label.config(text="", fg=color)
+        for button in buttons:
+            button.config(state="normal")
+        done(future.result())
+
+
 class LoginApp(tk.Tk):
     """
     Main application window for the login and account creation screens.
@@ -15,18 +62,25 @@ class LoginApp(tk.Tk):
         self.geometry("400x500")
         self.configure(bg="#2c3e50")
 
-        # In-memory user database to store credentials
-        self.user_database = {}
+        # Saved accounts, loading in the background while the window is drawn
+        # The admin password is stored the old, fast way so that startup
+        # never waits for the KDF; it is rehashed on the first login
+        self.accounts = AccountStore(defaults={
+            "admin": {"password": hashlib.sha256("password123".encode()).hexdigest()},
+        })
+        self.password_worker = PasswordWorker(self)
 
         self.container = tk.Frame(self)
         self.container.pack(fill="both", expand=True)
 
         self.login_screen = LoginScreen(
-            self.container, self.show_create_account, self.on_login_success, self.user_database)
+            self.container, self.show_create_account, self.on_login_success, self.accounts,
+            self.password_worker)
         self.create_account_screen = CreateAccountScreen(
-            self.container, self.show_login_screen, self.user_database)
+            self.container, self.show_login_screen, self.accounts, self.password_worker)
 
         self.login_screen.pack(fill="both", expand=True)
+        boot_trace.first_paint(self, "login")
 
     def show_login_screen(self):
         """Displays the login screen and hides the create account screen."""
@@ -44,7 +98,8 @@ class LoginApp(tk.Tk):
         """Called upon successful login to close this window and launch the OS."""
         self.destroy()
         # Launch the main HomeOS application with the logged-in username
-        home_app = HomeOS(username=username)
+        with boot_trace.span("HomeOS.__init__"):
+            home_app = HomeOS(username=username)
         home_app.title(f"HomeOS - Logged in as {username}")
         home_app.mainloop()
 
@@ -54,22 +109,24 @@ class LoginScreen(tk.Frame):
     Login screen with username and password fields.
     """
 
-    def __init__(self, master, show_create_account_callback, on_login_success_callback, user_database):
+    def __init__(self, master, show_create_account_callback, on_login_success_callback, accounts,
+                 password_worker):
         super().__init__(master, bg="#2c3e50")
         self.show_create_account_callback = show_create_account_callback
         self.on_login_success_callback = on_login_success_callback
-        self.user_database = user_database
+        self.accounts = accounts
+        self.password_worker = password_worker
 
         self.login_frame = tk.Frame(
             self, bg="#34495e", padx=40, pady=40, borderwidth=2, relief="groove")
         self.login_frame.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
 
-        tk.Label(self.login_frame, text="HomeOS Login", font=(
-            "Helvetica", 24, "bold"), fg="#ecf0f1", bg="#34495e").pack(pady=(0, 20))
+        tk.Label(self.login_frame, text="HomeOS Login", font=styles.preset(
+            self, "title"), fg="#ecf0f1", bg="#34495e").pack(pady=(0, 20))
         tk.Label(self.login_frame, text="Username:",
                  fg="#ecf0f1", bg="#34495e").pack(pady=5)
         self.username_entry = tk.Entry(
-            self.login_frame, font=("Helvetica", 12))
+            self.login_frame, font=styles.preset(self, "body"))
         self.username_entry.pack(pady=5)
         # Default user for quick testing
         self.username_entry.insert(0, "admin")
@@ -77,7 +134,7 @@ class LoginScreen(tk.Frame):
         tk.Label(self.login_frame, text="Password:",
                  fg="#ecf0f1", bg="#34495e").pack(pady=5)
         self.password_entry = tk.Entry(
-            self.login_frame, show="*", font=("Helvetica", 12))
+            self.login_frame, show="*", font=styles.preset(self, "body"))
         self.password_entry.pack(pady=5)
         # Default password for quick testing
         self.password_entry.insert(0, "password123")
@@ -86,10 +143,12 @@ class LoginScreen(tk.Frame):
             self.login_frame, text="", fg="#e74c3c", bg="#34495e")
         self.message_label.pack(pady=(5, 10))
 
-        tk.Button(self.login_frame, text="Login", command=self.check_login, font=("Helvetica", 12, "bold"), bg="#27ae60",
-                  fg="#ffffff", activebackground="#2ecc71", activeforeground="#ffffff", relief="raised", cursor="hand2").pack(pady=(10, 5))
-        tk.Button(self.login_frame, text="Create Account", command=self.show_create_account_callback, font=("Helvetica", 10),
-                  bg="#3498db", fg="#ffffff", activebackground="#2980b9", activeforeground="#ffffff", relief="flat", cursor="hand2").pack()
+        self.login_button = tk.Button(self.login_frame, text="Login", command=self.check_login, font=styles.preset(self, "body-bold"), bg="#27ae60",
+                                      fg="#ffffff", activebackground="#2ecc71", activeforeground="#ffffff", relief="raised", cursor="hand2")
+        self.login_button.pack(pady=(10, 5))
+        self.create_account_button = tk.Button(self.login_frame, text="Create Account", command=self.show_create_account_callback, font=styles.preset(self, "small"),
+                                               bg="#3498db", fg="#ffffff", activebackground="#2980b9", activeforeground="#ffffff", relief="flat", cursor="hand2")
+        self.create_account_button.pack()
 
     def check_login(self):
         username = self.username_entry.get()
@@ -100,14 +159,26 @@ class LoginScreen(tk.Frame):
                 text="Please enter a username and password.")
             return
 
-        if username in self.user_database:
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            if self.user_database[username] == hashed_password:
+        def check():
+            account = self.accounts.get(username)
+            if not passwords.check_account(password, account):
+                return False
+            if passwords.needs_upgrade(account):
+                # The password is known now, so rehash it with the current settings
+                try:
+                    self.accounts.update(username, passwords.hash_password(password))
+                except OSError:
+                    pass  # Still usable; the upgrade is tried again next login
+            return True
+
+        def checked(valid):
+            if valid:
                 self.on_login_success_callback(username)
             else:
                 self.message_label.config(text="Invalid username or password.")
-        else:
-            self.message_label.config(text="Invalid username or password.")
+
+        self.password_worker.run(check, checked, self.message_label,
+                                 (self.login_button, self.create_account_button), "Checking...")
 
 
 class CreateAccountScreen(tk.Frame):
@@ -115,37 +186,40 @@ class CreateAccountScreen(tk.Frame):
     Screen for creating a new user account.
     """
 
-    def __init__(self, master, show_login_screen_callback, user_database):
+    def __init__(self, master, show_login_screen_callback, accounts, password_worker):
         super().__init__(master, bg="#2c3e50")
         self.show_login_screen_callback = show_login_screen_callback
-        self.user_database = user_database
+        self.accounts = accounts
+        self.password_worker = password_worker
 
         self.create_frame = tk.Frame(
             self, bg="#34495e", padx=40, pady=40, borderwidth=2, relief="groove")
         self.create_frame.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
 
-        tk.Label(self.create_frame, text="Create New Account", font=(
-            "Helvetica", 20, "bold"), fg="#ecf0f1", bg="#34495e").pack(pady=(0, 10))
+        tk.Label(self.create_frame, text="Create New Account", font=styles.preset(
+            self, "subtitle"), fg="#ecf0f1", bg="#34495e").pack(pady=(0, 10))
         tk.Label(self.create_frame, text="Username:",
                  fg="#ecf0f1", bg="#34495e").pack(pady=5)
         self.username_entry = tk.Entry(
-            self.create_frame, font=("Helvetica", 12))
+            self.create_frame, font=styles.preset(self, "body"))
         self.username_entry.pack(pady=5)
 
         tk.Label(self.create_frame, text="Password (min 8 chars):",
                  fg="#ecf0f1", bg="#34495e").pack(pady=5)
         self.password_entry = tk.Entry(
-            self.create_frame, show="*", font=("Helvetica", 12))
+            self.create_frame, show="*", font=styles.preset(self, "body"))
         self.password_entry.pack(pady=5)
 
         self.message_label = tk.Label(
             self.create_frame, text="", fg="#e74c3c", bg="#34495e")
         self.message_label.pack(pady=(5, 10))
 
-        tk.Button(self.create_frame, text="Create Account", command=self.create_account, font=("Helvetica", 12, "bold"), bg="#27ae60",
-                  fg="#ffffff", activebackground="#2ecc71", activeforeground="#ffffff", relief="raised", cursor="hand2").pack(pady=(10, 5))
-        tk.Button(self.create_frame, text="Back to Login", command=self.show_login_screen_callback, font=("Helvetica", 10),
-                  bg="#3498db", fg="#ffffff", activebackground="#2980b9", activeforeground="#ffffff", relief="flat", cursor="hand2").pack()
+        self.create_account_button = tk.Button(self.create_frame, text="Create Account", command=self.create_account, font=styles.preset(self, "body-bold"), bg="#27ae60",
+                                               fg="#ffffff", activebackground="#2ecc71", activeforeground="#ffffff", relief="raised", cursor="hand2")
+        self.create_account_button.pack(pady=(10, 5))
+        self.back_button = tk.Button(self.create_frame, text="Back to Login", command=self.show_login_screen_callback, font=styles.preset(self, "small"),
+                                     bg="#3498db", fg="#ffffff", activebackground="#2980b9", activeforeground="#ffffff", relief="flat", cursor="hand2")
+        self.back_button.pack()
 
     def create_account(self):
         username = self.username_entry.get()
@@ -160,19 +234,32 @@ class CreateAccountScreen(tk.Frame):
                 text="Password must be at least 8 characters long.")
             return
 
-        if username in self.user_database:
-            self.message_label.config(text="Username already exists.")
-        else:
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
-            self.user_database[username] = hashed_password
-            messagebox.showinfo(
-                "Success", "Account created successfully! Please log in.")
+        def create():
+            if username in self.accounts:
+                return False, None  # Without spending time hashing the password
+            try:
+                return self.accounts.add(username, passwords.hash_password(password)), None
+            except OSError as e:
+                return True, e
+
+        def created(result):
+            added, error = result
+            if not added:
+                self.message_label.config(text="Username already exists.")
+                return
+            if error is not None:
+                messagebox.showerror(
+                    "Error", f"The account was created but could not be saved, so it will be lost when you exit: {error}")
+            else:
+                messagebox.showinfo(
+                    "Success", "Account created successfully! Please log in.")
             self.show_login_screen_callback()
 
+        self.password_worker.run(create, created, self.message_label,
+                                 (self.create_account_button, self.back_button), "Creating account...")
+
 
 if __name__ == "__main__":
-    app = LoginApp()
-    # Pre-populate a test user for convenience
-    test_user_hash = hashlib.sha256("password123".encode()).hexdigest()
-    app.user_database["admin"] = test_user_hash
+    with boot_trace.span("LoginApp.__init__"):
+        app = LoginApp()
     app.mainloop()
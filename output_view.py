@@ -0,0 +1,277 @@
+import tkinter as tk
+
+
+class LineStore:
+    """
+    The terminal's output, one entry per line.
+
+    A line with no styling is kept as a plain string and a coloured one as
+    a tuple of (text, tags) runs. The last line is still being written to
+    and stays a list of runs until a newline ends it. Trimming the oldest
+    lines only advances an offset; the list is compacted once most of it
+    is dead, so adding and trimming lines are both cheap however many
+    lines are stored.
+
+    `dropped` counts the lines trimmed so far, so that `dropped + index`
+    keeps naming the same line while older ones are trimmed.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._lines = [[]]
+        self._start = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._lines) - self._start
+
+    def runs(self, index):
+        """Returns the (text, tags) runs of a line."""
+        line = self._lines[self._start + index]
+        return ((line, ()),) if isinstance(line, str) else line
+
+    def text(self, index):
+        """Returns the plain text of a line."""
+        line = self._lines[self._start + index]
+        return line if isinstance(line, str) else "".join(text for text, tags in line)
+
+    def append(self, runs):
+        """Appends (text, tags) runs to the end of the output."""
+        lines = self._lines
+        for text, tags in runs:
+            parts = text.split("\n")
+            if parts[0]:
+                lines[-1].append((parts[0], tags))
+            if len(parts) == 1:
+                continue
+            lines[-1] = self._freeze(lines[-1])
+            if tags:
+                lines.extend(((part, tags),) if part else "" for part in parts[1:-1])
+            else:
+                lines.extend(parts[1:-1])
+            lines.append([(parts[-1], tags)] if parts[-1] else [])
+
+    @staticmethod
+    def _freeze(runs):
+        """Converts a finished line to its compact form."""
+        if all(not tags for text, tags in runs):
+            return "".join(text for text, tags in runs)
+        return tuple(runs)
+
+    def trim(self, count):
+        """Drops the oldest `count` lines."""
+        count = min(count, len(self) - 1)
+        self._start += count
+        self.dropped += count
+        if self._start > len(self._lines) // 2:
+            del self._lines[:self._start]
+            self._start = 0
+
+    def remove_last(self, count):
+        """Removes the newest `count` lines, reopening the line before them."""
+        count = min(count, len(self) - 1)
+        if not count:
+            return
+        del self._lines[len(self._lines) - count:]
+        last = self._lines[-1]
+        if isinstance(last, str):
+            self._lines[-1] = [(last, ())] if last else []
+        else:
+            self._lines[-1] = list(last)
+
+    def search(self, query, before, stop=0):
+        """
+        Returns the (line, column) of the last case-insensitive match of
+        `query` above line `before` and at or below line `stop`, or None.
+        """
+        query = query.lower()
+        for index in range(min(before, len(self)) - 1, max(stop, 0) - 1, -1):
+            column = self.text(index).lower().find(query)
+            if column != -1:
+                return index, column
+        return None
+
+
+class OutputView(tk.Frame):
+    """
+    A Text widget that shows a LineStore of any size.
+
+    Only the visible lines plus MARGIN lines either side are ever put in
+    the widget, so Tk lays out a few hundred lines no matter how long the
+    output is. The scrollbar is driven from the store rather than from
+    the widget, and scrolling inside the margin only moves the widget's
+    view; going past it swaps in a new window of lines.
+    """
+
+    MARGIN = 100
+
+    def __init__(self, master, **text_options):
+        super().__init__(master, bg=text_options.get("bg"))
+        self.store = LineStore()
+        self.scrollbar = tk.Scrollbar(self, command=self._scrollbar_moved)
+        self.scrollbar.pack(side="right", fill="y")
+        self.text = tk.Text(self, state="disabled", **text_options)
+        self.text.pack(side="left", expand=True, fill="both")
+        self.text.tag_config("search", background="#264f78")
+        # Height of the view in lines, measured with the widget's tkinter Font
+        self._line_height = text_options["font"].metrics("linespace")
+        self._height = 24
+
+        # First visible line, and whether to keep showing the newest output
+        self.top = 0
+        self.follow = True
+        # The store lines [start, end) currently in the widget
+        self._window = (0, 1)
+
+        self.text.bind("<Configure>", self._resized)
+        self.text.bind("<MouseWheel>", self._mouse_wheel)
+        self.text.bind("<Button-4>", self._mouse_wheel)
+        self.text.bind("<Button-5>", self._mouse_wheel)
+
+    # --- Content ---
+
+    def append(self, runs):
+        """Adds (text, tags) runs at the end of the output."""
+        old_total = len(self.store)
+        self.store.append(runs)
+        total = len(self.store)
+        start, end = self._window
+        if not (self.follow and end == old_total):
+            self._update_scrollbar()
+            return
+        if total - old_total > self._height + 2 * self.MARGIN:
+            self._render()  # Only the newest lines of a big batch are shown
+            return
+
+        arguments = []
+        for text, tags in runs:
+            arguments.append(text)
+            arguments.append(tags)
+        new_start = max(start, total - self._height - self.MARGIN)
+        self.text.config(state="normal")
+        self.text.insert(tk.END, *arguments)
+        if new_start > start:
+            self.text.delete("1.0", f"{new_start - start + 1}.0")
+        self.text.config(state="disabled")
+        self._window = (new_start, total)
+        self._show()
+
+    def trim(self, count):
+        """Drops the oldest `count` lines from the output."""
+        if not count:
+            return
+        self.store.trim(count)
+        start, end = self._window
+        self.top = max(0, self.top - count)
+        if end <= count:
+            # Everything in the widget was trimmed
+            self._render()
+            return
+        if start < count:
+            # The window began inside the trimmed lines
+            self.text.config(state="normal")
+            self.text.delete("1.0", f"{count - start + 1}.0")
+            self.text.config(state="disabled")
+        self._window = (max(start - count, 0), end - count)
+        self._update_scrollbar()
+
+    def remove_last(self, count):
+        """Removes the newest `count` lines of output."""
+        self.store.remove_last(count)
+        total = len(self.store)
+        if self._window[1] > total:
+            self.top = min(self.top, max(0, total - self._height))
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    def clear(self):
+        self.store.clear()
+        self.top = 0
+        self.follow = True
+        self.text.config(state="normal")
+        self.text.delete("1.0", tk.END)
+        self.text.config(state="disabled")
+        self._window = (0, 1)
+        self._update_scrollbar()
+
+    # --- Scrolling ---
+
+    def scroll_to(self, top):
+        """Shows the output from line `top` down."""
+        last_top = max(0, len(self.store) - self._height)
+        self.top = max(0, min(top, last_top))
+        self.follow = self.top >= last_top
+        start, end = self._window
+        low = max(0, self.top - self.MARGIN // 2)
+        high = min(len(self.store), self.top + self._height + self.MARGIN // 2)
+        if start <= low and high <= end and not (self.follow and end < len(self.store)):
+            self._show()
+        else:
+            self._render()
+
+    def show_match(self, line, column, length):
+        """Scrolls a line into the middle of the view and highlights a match in it."""
+        self.scroll_to(line - self._height // 2)
+        self.text.tag_remove("search", "1.0", tk.END)
+        start = self._window[0]
+        index = f"{line - start + 1}.{column}"
+        self.text.tag_add("search", index, f"{index}+{length}c")
+
+    def _render(self):
+        """Replaces the widget's contents with the window around the view."""
+        total = len(self.store)
+        if self.follow:
+            self.top = max(0, total - self._height)
+        start = max(0, self.top - self.MARGIN)
+        end = min(total, self.top + self._height + self.MARGIN)
+        if self.follow:
+            end = total
+        arguments = []
+        for index in range(start, end):
+            if index > start:
+                arguments.append("\n")
+                arguments.append(())
+            for text, tags in self.store.runs(index):
+                arguments.append(text)
+                arguments.append(tags)
+        self.text.config(state="normal")
+        self.text.delete("1.0", tk.END)
+        if arguments:
+            self.text.insert(tk.END, *arguments)
+        self.text.config(state="disabled")
+        self._window = (start, end)
+        self._show()
+
+    def _show(self):
+        """Positions the widget's view on the top line and updates the scrollbar."""
+        if self.follow:
+            self.top = max(0, len(self.store) - self._height)
+            self.text.see(tk.END)
+        else:
+            self.text.yview(f"{self.top - self._window[0] + 1}.0")
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = max(len(self.store), 1)
+        self.scrollbar.set(self.top / total, min(1.0, (self.top + self._height) / total))
+
+    def _scrollbar_moved(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.store)))
+        elif action == "scroll":
+            step = self._height - 1 if unit == "pages" else 1
+            self.scroll_to(self.top + int(amount) * step)
+
+    def _mouse_wheel(self, event):
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.scroll_to(self.top + (-3 if up else 3))
+        return "break"
+
+    def _resized(self, event):
+        height = max(1, event.height // self._line_height)
+        if height != self._height:
+            self._height = height
+            self.scroll_to(self.top)
@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from appdata import data_path
+
+# Cost settings used until the host has been calibrated
+DEFAULT_PARAMS = {"kdf": "scrypt", "n": 2 ** 14, "r": 8, "p": 1}
+# How long verifying a password should take, in milliseconds
+DEFAULT_TARGET_MS = 250
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+_params = None
+# Checked against when there is no such account, so that looking up a
+# missing user takes as long as checking a wrong password
+_unknown_account = None
+
+
+def _derive(password, salt, params):
+    """Derives a key from a password with the KDF and costs in `params`."""
+    password = password.encode()
+    if params["kdf"] == "scrypt":
+        n, r, p = params["n"], params["r"], params["p"]
+        # scrypt needs about 128 * n * r bytes, more than its default limit
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=KEY_BYTES)
+    if params["kdf"] == "pbkdf2_sha256":
+        return hashlib.pbkdf2_hmac("sha256", password, salt, params["iterations"], KEY_BYTES)
+    raise ValueError(f"unknown KDF '{params['kdf']}'")
+
+
+def _cost(params):
+    """Returns the work factor of a KDF's settings, for comparing settings of the same KDF."""
+    if params["kdf"] == "scrypt":
+        return params["n"] * params["r"] * params["p"]
+    return params.get("iterations", 0)
+
+
+def hash_password(password, params=None):
+    """
+    Returns an account record holding a salted hash of a password and the
+    settings it was made with, so it can still be checked after the
+    settings change. Slow by design: call it off the Tk thread.
+    """
+    params = params or current_params()
+    salt = os.urandom(SALT_BYTES)
+    return dict(params, salt=salt.hex(), password=_derive(password, salt, params).hex())
+
+
+def verify(password, record):
+    """
+    Returns whether a password matches an account record. Records from
+    before salted hashing hold a bare SHA-256 of the password.
+    """
+    if "kdf" not in record:
+        expected = hashlib.sha256(password.encode()).hexdigest()
+    else:
+        params = {key: value for key, value in record.items() if key not in ("salt", "password")}
+        expected = _derive(password, bytes.fromhex(record["salt"]), params).hex()
+    return hmac.compare_digest(expected, record["password"])
+
+
+def check_account(password, record):
+    """Like verify(), but takes the same time when `record` is None and fails."""
+    global _unknown_account
+    if record is None:
+        if _unknown_account is None:
+            _unknown_account = hash_password("")
+        verify(password, _unknown_account)
+        return False
+    return verify(password, record)
+
+
+def needs_upgrade(record, params=None):
+    """Returns whether a record was hashed with a different KDF or a lower cost than `params`."""
+    params = params or current_params()
+    return record.get("kdf") != params["kdf"] or _cost(record) < _cost(params)
+
+
+def current_params():
+    """Returns the calibrated KDF settings for this host, or the defaults."""
+    global _params
+    if _params is None:
+        try:
+            with open(data_path("kdf.json"), "r", encoding="utf-8") as f:
+                _params = json.load(f)
+            _cost(_params)
+        except (OSError, ValueError, KeyError, TypeError):
+            _params = dict(DEFAULT_PARAMS)
+    return _params
+
+
+def is_calibrated():
+    return os.path.exists(data_path("kdf.json"))
+
+
+def _time_derive(params, repeat=3):
+    """Returns the fastest of `repeat` derivations with these settings, in seconds."""
+    salt = os.urandom(SALT_BYTES)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _derive("calibration", salt, params)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(target_ms=DEFAULT_TARGET_MS, report=None):
+    """
+    Picks the KDF settings that make one verification take about
+    `target_ms` on this host, saves them for current_params() and returns
+    them. Uses scrypt, doubling its cost until the target is reached, or
+    PBKDF2-SHA256 where the hashlib build has no scrypt.
+    """
+    global _params
+    target = target_ms / 1000
+    if hasattr(hashlib, "scrypt"):
+        params = {"kdf": "scrypt", "n": 2 ** 12, "r": 8, "p": 1}
+        elapsed = _time_derive(params)
+        if report:
+            report(params, elapsed)
+        while elapsed < target and params["n"] < 2 ** 20:
+            candidate = dict(params, n=params["n"] * 2)
+            candidate_time = _time_derive(candidate)
+            if report:
+                report(candidate, candidate_time)
+            # Stop at whichever of the two costs is closer to the target
+            if candidate_time > target and candidate_time - target > target - elapsed:
+                break
+            params, elapsed = candidate, candidate_time
+    else:
+        params = {"kdf": "pbkdf2_sha256", "iterations": 100000}
+        elapsed = _time_derive(params)
+        params["iterations"] = max(100000, int(params["iterations"] * target / elapsed))
+        if report:
+            report(params, _time_derive(params))
+
+    path = data_path("kdf.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    os.replace(path + ".tmp", path)
+    _params = params
+    return params
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Calibrate the password hashing cost for this computer.")
+    parser.add_argument("--target-ms", type=float, default=DEFAULT_TARGET_MS,
+                        help="how long checking a password should take (default: %(default)s)")
+    args = parser.parse_args()
+
+    def report(params, elapsed):
+        settings = ", ".join(f"{key}={value}" for key, value in params.items() if key != "kdf")
+        print(f"{params['kdf']:<14} {settings:<24} {elapsed * 1000:8.1f} ms")
+
+    params = calibrate(args.target_ms, report)
+    print(f"Saved {params} to {data_path('kdf.json')}")
+    print("Accounts are rehashed with these settings the next time they log in.")
+
+
+if __name__ == "__main__":
+    main()
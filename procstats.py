@@ -0,0 +1,94 @@
+import os
+import sys
+import threading
+import time
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+# Used for the uptime when /proc can't tell when the process started
+_IMPORTED = time.monotonic()
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def _stat_fields():
+    """
+    Returns the fields of /proc/self/stat after the command name, so
+    index 0 is the process state (field 3 in proc(5)), or None.
+    """
+    stat = _read("/proc/self/stat")
+    if stat is None:
+        return None
+    # The command name is in parentheses and may itself contain spaces
+    return stat[stat.rindex(")") + 2:].split()
+
+
+def rss_bytes():
+    """Returns the resident set size of the process, or None if unknown."""
+    statm = _read("/proc/self/statm")
+    if statm is not None:
+        return int(statm.split()[1]) * _PAGE_SIZE
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Peak rather than current, in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def cpu_seconds():
+    """Returns the user plus system CPU time used by the process."""
+    fields = _stat_fields()
+    if fields is not None:
+        return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    times = os.times()
+    return times.user + times.system
+
+
+def thread_count():
+    fields = _stat_fields()
+    if fields is not None:
+        return int(fields[17])
+    return threading.active_count()
+
+
+def uptime_seconds():
+    """Returns how long the process has been running."""
+    fields = _stat_fields()
+    uptime = _read("/proc/uptime")
+    if fields is not None and uptime is not None:
+        return float(uptime.split()[0]) - int(fields[19]) / _CLOCK_TICKS
+    return time.monotonic() - _IMPORTED
+
+
+class CpuMeter:
+    """Measures the process's CPU use as a percentage of one core between calls."""
+
+    def __init__(self, since_start=False):
+        if since_start:
+            self._wall, self._cpu = time.monotonic() - uptime_seconds(), 0.0
+        else:
+            self._wall, self._cpu = time.monotonic(), cpu_seconds()
+
+    def percent(self):
+        """Returns the CPU use since the previous call (or since creation, or since the process started)."""
+        wall, cpu = time.monotonic(), cpu_seconds()
+        elapsed = wall - self._wall
+        used = cpu - self._cpu
+        self._wall, self._cpu = wall, cpu
+        return 100 * used / elapsed if elapsed > 0 else 0.0
+
+
+def format_bytes(size):
+    """Formats a byte count with a binary unit, e.g. '12.3 MiB'."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
@@ -1,5 +1,6 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog, font, colorchooser, ttk
+import styles
 
 
 class PydocsApp(tk.Frame):
@@ -26,10 +27,15 @@ class PydocsApp(tk.Frame):
         self.scrollbar = tk.Scrollbar(self.text_area_frame)
         self.scrollbar.pack(side="right", fill="y")
 
+        # The document's own fonts, changed in place by the font selector
+        self.text_font = font.Font(self, family="Arial", size=12)
+        self.bold_font = font.Font(self, family="Arial", size=12, weight="bold")
+        self.italic_font = font.Font(self, family="Arial", size=12, slant="italic")
+
         self.text_area = tk.Text(
             self.text_area_frame,
             wrap="word",  # Wraps text at word boundaries
-            font=("Arial", 12),
+            font=self.text_font,
             undo=True,
             yscrollcommand=self.scrollbar.set
         )
@@ -71,7 +77,7 @@ class PydocsApp(tk.Frame):
         self.toolbar.pack(fill="x", padx=10, pady=(0, 5))
 
         # Font Selection Combobox
-        self.font_families = sorted(font.families())
+        self.font_families = list(styles.font_families(self))
         self.font_selection = ttk.Combobox(
             self.toolbar, values=self.font_families, state="readonly", width=15)
         self.font_selection.set("Arial")
@@ -83,7 +89,7 @@ class PydocsApp(tk.Frame):
         self.bold_button = tk.Button(
             self.toolbar,
             text="B",
-            font=("Arial", 10, "bold"),
+            font=styles.shared_font(self, "Arial", 10, "bold"),
             command=self.apply_bold,
             relief="raised",
             padx=5,
@@ -95,7 +101,7 @@ class PydocsApp(tk.Frame):
         self.italic_button = tk.Button(
             self.toolbar,
             text="I",
-            font=("Arial", 10, "italic"),
+            font=styles.shared_font(self, "Arial", 10, slant="italic"),
             command=self.apply_italic,
             relief="raised",
             padx=5,
@@ -104,10 +110,8 @@ class PydocsApp(tk.Frame):
         self.italic_button.pack(side="left", padx=2)
 
         # Initial font setup
-        self.text_area.tag_configure("bold", font=(
-            self.font_selection.get(), 12, "bold"))
-        self.text_area.tag_configure("italic", font=(
-            self.font_selection.get(), 12, "italic"))
+        self.text_area.tag_configure("bold", font=self.bold_font)
+        self.text_area.tag_configure("italic", font=self.italic_font)
 
     # --- File Operations ---
 
@@ -177,16 +181,11 @@ class PydocsApp(tk.Frame):
             pass  # No text selected
 
     def change_font_family(self, event):
+        # The text and the bold and italic tags use these fonts by name,
+        # so reconfiguring them restyles the whole document
         new_font_family = self.font_selection.get()
-        current_font = font.Font(self.text_area, self.text_area.cget("font"))
-        current_font.configure(family=new_font_family)
-        self.text_area.config(font=current_font)
-
-        # Update bold and italic tags to use the new font family
-        self.text_area.tag_configure("bold", font=(
-            new_font_family, current_font.cget("size"), "bold"))
-        self.text_area.tag_configure("italic", font=(
-            new_font_family, current_font.cget("size"), "italic"))
+        for document_font in (self.text_font, self.bold_font, self.italic_font):
+            document_font.configure(family=new_font_family)
 
     def change_background_color(self):
         """Opens a color picker and changes the background color of the desktop."""
@@ -0,0 +1,106 @@
+import fnmatch
+import re
+
+from trigram import TrigramIndex
+
+# Characters that give a grep pattern a meaning beyond its literal text
+REGEX_METACHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+def literal_runs(glob):
+    """Returns the runs of plain characters between the wildcards of a glob."""
+    return [run for run in re.split(r"[*?]|\[[^\]]*\]", glob) if run]
+
+
+class SearchIndex:
+    """
+    Name and content indexes over a VirtualFileSystem, used by `find` and
+    `grep -r`.
+
+    The name index maps each name to the nodes carrying it, plus a trigram
+    index over the distinct names for globs. The content index is a trigram
+    index over each file's lowercased bytes. The filesystem calls the
+    add/remove/append hooks on every mutation, so the indexes never need
+    rebuilding after the first search.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.name_trigrams = TrigramIndex()
+        self.contents = TrigramIndex()
+
+    # --- Maintenance hooks ---
+
+    def add_node(self, node, check=None):
+        """Indexes a node; `check` is called between chunks of its content."""
+        nodes = self.names.get(node.name)
+        if nodes is None:
+            nodes = self.names[node.name] = set()
+            self.name_trigrams.add(node.name, node.name)
+        nodes.add(node)
+        if not node.is_dir:
+            tail = b""
+            for chunk in node.content.iter_chunks():
+                if check is not None:
+                    check()
+                self.append_content(node, tail, chunk)
+                tail = (tail + chunk)[-2:]
+
+    def remove_node(self, node):
+        nodes = self.names.get(node.name)
+        if nodes is not None:
+            nodes.discard(node)
+            if not nodes:
+                del self.names[node.name]
+                self.name_trigrams.remove(node.name, node.name)
+        if not node.is_dir:
+            self.clear_content(node)
+
+    def append_content(self, node, tail, data):
+        """
+        Indexes bytes appended to a file. `tail` holds the two bytes that
+        preceded them, so trigrams spanning the old end are indexed too.
+        """
+        self.contents.add(node, (tail + data).lower())
+
+    def clear_content(self, node):
+        if node.content.size:
+            self.contents.remove(node, self._file_bytes(node))
+
+    @staticmethod
+    def _file_bytes(node):
+        return b"".join(node.content.iter_chunks()).lower()
+
+    # --- Queries ---
+
+    def find_names(self, glob):
+        """Yields the nodes whose name matches a shell-style glob."""
+        if not any(char in glob for char in "*?["):
+            yield from list(self.names.get(glob, ()))
+            return
+
+        # A matching name contains every literal run, so only names holding
+        # all of their trigrams need checking against the glob
+        runs = [run for run in literal_runs(glob) if TrigramIndex.searchable(run)]
+        if runs:
+            candidates = self.name_trigrams.candidates(*runs)
+        else:
+            candidates = list(self.names)
+        matcher = re.compile(fnmatch.translate(glob))
+        for name in candidates:
+            if matcher.match(name):
+                yield from list(self.names.get(name, ()))
+
+    def content_candidates(self, pattern, ignore_case=False):
+        """
+        Returns the file nodes that may contain a grep pattern, or None if
+        the pattern can't be looked up (regular expressions, or fewer than
+        three characters) and every file must be scanned.
+        """
+        if any(char in REGEX_METACHARACTERS for char in pattern):
+            return None
+        if not TrigramIndex.searchable(pattern):
+            return None
+        if ignore_case and not pattern.isascii():
+            return None  # The index only folds ASCII case
+        return list(self.contents.candidates(pattern.encode("utf-8").lower()))
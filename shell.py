@@ -0,0 +1,884 @@
+import datetime
+import random
+import re
+import threading
+import time
+from collections import deque
+
+import procstats
+from cmdline import ParseError, parse
+from trie import PrefixTrie
+from vfs import VirtualFileSystem, VFSError
+
+
+class CommandCancelled(Exception):
+    """Raised inside a running command once the user has cancelled it."""
+
+
+class Job:
+    """A command line running on the terminal's worker pool."""
+
+    def __init__(self, job_id, command_line, background):
+        self.id = job_id
+        self.command_line = command_line
+        self.background = background
+        self.cancelled = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        """Raises CommandCancelled if the job has been cancelled."""
+        if self.cancelled.is_set():
+            raise CommandCancelled()
+
+    def sleep(self, seconds):
+        """Waits like time.sleep, but wakes up early if the job is cancelled."""
+        if self.cancelled.wait(seconds):
+            raise CommandCancelled()
+
+
+def _split_lines(chunks):
+    """Splits a handler's output into lines; handlers may yield multi-line text."""
+    for chunk in chunks:
+        yield from str(chunk).split("\n")
+
+
+def _until_cancelled(items, job):
+    for item in items:
+        job.check()
+        yield item
+
+
+class Shell:
+    """
+    The command interpreter behind the HomeOS terminal, with no Tk
+    dependency: the virtual filesystem, the command table, pipeline
+    execution, prompt and tab completion.
+
+    All output, including error messages, goes through the `output`
+    callable, so the same shell can drive the Tk terminal, a script or a
+    benchmark.
+    """
+
+    # Maximum number of candidates printed when a completion is ambiguous
+    COMPLETION_LIST_LIMIT = 100
+    # How deeply scripts may `source` other scripts
+    MAX_SOURCE_DEPTH = 16
+
+    def __init__(self, username, output, store=None, history=None, hostname="homeos",
+                 isatty=True):
+        """
+        Initializes the shell.
+
+        Args:
+            username (str): The logged-in username.
+            output (callable): Called with each line of output.
+            store (VFSStore): Persists the filesystem, or None to keep it in
+                memory only.
+            history (CommandHistory): The user's command history, shown by
+                the `history` command.
+            hostname (str): The host name shown in the prompt.
+            isatty (bool): Whether `output` is shown on a screen. If not,
+                commands leave out colours even at the end of a pipeline.
+        """
+        self.user = username
+        self.hostname = hostname
+        self.print_output = output
+        self.history = history
+        self.output_isatty = isatty
+        # Per-thread state of the running command: its job, whether its
+        # output is the screen, whether it failed, and how many scripts
+        # deep it is (filesystem commits wait until the outermost ends)
+        self._exec_state = threading.local()
+
+        # Mock file system for the `ls` and `cd` commands, restored from
+        # disk and journaled so it survives restarts.
+        self.file_system = VirtualFileSystem()
+        self.vfs_store = store
+        if store is None or not store.load(self.file_system):
+            self._populate_file_system()
+            self._commit_file_system(snapshot=True)
+        self.file_system.home = self.file_system.mkdir("/home", parents=True)
+        self.home_directory = self.file_system.home
+        self.current_directory = self.home_directory
+
+        # Command handlers and their help texts, in the order `help` lists them
+        self.commands = {}
+        self.help_topics = {}
+        self.command_completions = PrefixTrie()
+        self.register_command(
+            "help", self._cmd_help,
+            "help [command] Shows specific help for a command",
+            "Usage: help [command]\nShows specific information for a given command.")
+        self.register_command(
+            "echo", self._cmd_echo,
+            "echo [text]    Prints the text back to the terminal",
+            "Usage: echo [text]\nPrints a line of text to the terminal.")
+        self.register_command(
+            "ls", self._cmd_ls,
+            "ls [path]      Lists the contents of a directory",
+            "Usage: ls [path]\nLists files and directories in the given directory, or the current one.")
+        self.register_command(
+            "cd", self._cmd_cd,
+            "cd [dir]       Changes the current directory",
+            "Usage: cd [directory]\nChanges the current directory. Accepts absolute and relative paths. 'cd ..' moves to the parent directory. 'cd' with no arguments returns to the home directory.")
+        self.register_command(
+            "date", self._cmd_date,
+            "date           Displays the current date and time",
+            "Usage: date\nDisplays the current date and time.")
+        self.register_command(
+            "sysinfo", self._cmd_sysinfo,
+            "sysinfo        Displays mock system information",
+            "Usage: sysinfo\nDisplays system information about the OS, with the uptime, memory and CPU time of the HomeOS process. See also 'top' and 'ps'.")
+        self.register_command(
+            "mkdir", self._cmd_mkdir,
+            "mkdir [-p] dir Creates a new directory",
+            "Usage: mkdir [-p] [directory...]\nCreates new directories. '-p' also creates missing parent directories.")
+        self.register_command(
+            "touch", self._cmd_touch,
+            "touch [file]   Creates a new file",
+            "Usage: touch [file]\nCreates a new, empty file with the given name. Use 'echo text > file' to write to a file.")
+        self.register_command(
+            "rm", self._cmd_rm,
+            "rm [file]      Removes a file",
+            "Usage: rm [file]\nRemoves a file. Does not work on directories.")
+        self.register_command(
+            "rmdir", self._cmd_rmdir,
+            "rmdir [dir]    Removes an empty directory",
+            "Usage: rmdir [directory]\nRemoves an empty directory.")
+        self.register_command(
+            "whoami", self._cmd_whoami,
+            "whoami         Displays the current username",
+            "Usage: whoami\nDisplays the name of the current user.")
+        self.register_command(
+            "ping", self._cmd_ping,
+            "ping [ip/host] Simulates a network ping",
+            "Usage: ping [ip/host]\nSimulates sending data packets to a network host.")
+        self.register_command(
+            "ifconfig", self._cmd_ifconfig,
+            "ifconfig       Displays mock network configuration",
+            "Usage: ifconfig\nDisplays a mock network configuration for the system.")
+        self.register_command(
+            "history", self._cmd_history,
+            "history [n]    Shows recent commands (Ctrl-R searches them)",
+            "Usage: history [n]\nShows the last n commands (default 20). Press Ctrl-R to search the history as you type; Ctrl-R again finds older matches, Escape cancels.")
+        self.register_command(
+            "source", self._cmd_source,
+            "source [file]  Runs the commands in a script file",
+            "Usage: source [file]\nRuns each line of a file as a command, without echoing the commands, then prints a summary. Blank lines and lines starting with '#' are skipped. Ctrl-C stops the script.")
+        self.register_command(
+            "cat", self._cmd_cat,
+            "cat [file...]  Prints the contents of files",
+            "Usage: cat [file...]\nPrints the contents of the given files, or copies its input.")
+        self.register_command(
+            "grep", self._cmd_grep,
+            "grep PATTERN [file...]  Prints lines matching a pattern",
+            "Usage: grep [-i] [-v] [-r] PATTERN [file...]\nPrints the lines of files, or of its input, that match a regular expression. '-i' ignores case, '-v' prints the lines that don't match, '-r' searches every file under the given directories (default: the current one). Flags can be combined, as in '-ri', and '--' ends them.")
+        self.register_command(
+            "find", self._cmd_find,
+            "find [path] [-name GLOB] [-type f|d]  Finds files by name",
+            "Usage: find [path...] [-name GLOB] [-type f|d]\nLists the files and directories under the given paths, optionally only those whose name matches a glob such as '*.txt'.")
+        self.register_command(
+            "head", self._cmd_head,
+            "head [-n N] [file]  Prints the first lines of a file or input",
+            "Usage: head [-n N] [file]\nPrints the first N lines (default 10) of a file or of its input, then stops reading.")
+        self.register_command(
+            "tail", self._cmd_tail,
+            "tail [-n N] [file]  Prints the last lines of a file or input",
+            "Usage: tail [-n N] [file]\nPrints the last N lines (default 10) of a file or of its input. Files are read backwards from the end.")
+        self.register_command(
+            "wc", self._cmd_wc,
+            "wc [-l|-w|-c] [file...]  Counts lines, words and bytes",
+            "Usage: wc [-l|-w|-c] [file...]\nCounts the lines, words and bytes of files or of its input.")
+
+    def register_command(self, name, handler, summary, usage):
+        """
+        Adds a command to the shell.
+
+        Args:
+            name (str): The command name.
+            handler (callable): Called as handler(args, stdin); see
+                run_pipeline().
+            summary (str): The command's line in the `help` listing.
+            usage (str): The text shown by `help name`.
+        """
+        self.commands[name] = handler
+        self.help_topics[name] = (summary, usage)
+        self.command_completions.insert(name)
+
+    def _populate_file_system(self):
+        """Creates the default directory layout on first boot."""
+        for path in ("/home/user/documents", "/home/user/downloads", "/home/guest", "/bin", "/etc", "/var"):
+            self.file_system.mkdir(path, parents=True)
+        for path in ("/home/profile.txt", "/etc/passwd", "/etc/hosts", "/var/log.txt",
+                     "/home/user/welcome.txt", "/home/user/documents/my_document.txt"):
+            self.file_system.touch(path)
+        for name in ("echo", "clear", "ls", "help", "exit", "date", "sysinfo", "mkdir", "touch", "whoami"):
+            self.file_system.touch(f"/bin/{name}")
+        self.file_system.write(
+            self.file_system.resolve("/var/log.txt"),
+            f"{datetime.datetime.now():%b %d %H:%M:%S} {self.hostname} kernel: HomeOS installed\n"
+            f"{datetime.datetime.now():%b %d %H:%M:%S} {self.hostname} login: session opened for user {self.user}\n")
+        self.file_system.write(
+            self.file_system.resolve("/home/user/welcome.txt"),
+            "Welcome to HomeOS!\nType 'help' in the terminal to see what you can do.\n")
+
+    def _commit_file_system(self, snapshot=False):
+        """Makes the filesystem changes of the last command durable."""
+        if self.vfs_store is None or self._script_depth():
+            return
+        try:
+            if snapshot:
+                self.vfs_store.compact()
+            else:
+                self.vfs_store.commit()
+        except OSError as e:
+            self.print_output(f"Error: could not save the file system: {e}")
+
+    def prompt(self):
+        """Constructs the bash-style prompt string."""
+        return f"{self.user}@{self.hostname}:{self.display_path(self.current_directory)}$ "
+
+    def display_path(self, node):
+        """Returns a node's path with the home directory abbreviated to '~'."""
+        path = self.file_system.path_of(node)
+        home = self.file_system.path_of(self.home_directory)
+        if path == home:
+            return "~"
+        if path.startswith(home + "/"):
+            return "~" + path[len(home):]
+        return path
+
+    # --- Completion ---
+
+    def complete(self, text):
+        """
+        Completes the last word of an input line, as a command name for the
+        first word and as a path otherwise.
+
+        A unique match is completed in full; several matches are completed
+        up to their longest common prefix, and listed if that adds nothing.
+
+        Returns:
+            tuple: (new text, listing), where listing is a line of candidates
+                to show, or None.
+        """
+        if not text:
+            return text, None
+
+        words = text.split()
+        if len(words) == 1 and not text[-1].isspace():
+            return self._complete(text, words[0], "", self.command_completions,
+                                  lambda match: " ")
+
+        # File path completion, resolving every segment before the last
+        partial_path = "" if text[-1].isspace() else words[-1]
+        dir_part, _, base = partial_path.rpartition("/")
+        if partial_path.startswith("/") and not dir_part:
+            dir_part = "/"
+        elif dir_part:
+            dir_part += "/"
+        try:
+            directory = self.file_system.resolve_dir(
+                dir_part or ".", self.current_directory)
+        except VFSError:
+            return text, None
+        return self._complete(text, base, dir_part,
+                              self.file_system.completion_trie(directory),
+                              lambda match: "/" if directory.children[match].is_dir else " ")
+
+    def _complete(self, text, partial, dir_part, trie, suffix_for):
+        """Completes the end of an input line from a trie."""
+        prefix = trie.longest_common_prefix(partial)
+        if prefix is None:
+            return text, None
+
+        if trie.count(partial) == 1:
+            completion = prefix + suffix_for(prefix)
+        elif len(prefix) > len(partial):
+            completion = prefix
+        else:
+            shown = list(trie.words(partial, limit=self.COMPLETION_LIST_LIMIT))
+            hidden = trie.count(partial) - len(shown)
+            listing = "  ".join(shown)
+            if hidden > 0:
+                listing += f"  ... and {hidden} more"
+            return text, listing
+
+        start = len(text) - len(dir_part) - len(partial)
+        return text[:start] + dir_part + completion, None
+
+    # --- Pipelines ---
+
+    def execute(self, command_line):
+        """Parses and runs a command line on the calling thread."""
+        try:
+            pipeline = parse(command_line)
+        except ParseError as e:
+            self.print_output(f"bash: {e}")
+            return
+        if pipeline.commands[0].argv:
+            self.run_pipeline(pipeline)
+
+    def run_pipeline(self, pipeline, job=None):
+        """
+        Runs a parsed pipeline, streaming each stage into the next.
+
+        Handlers are called as handler(args, stdin), where stdin is an
+        iterator of lines or None, and return an iterable of output lines
+        (usually a generator) or None. Nothing is buffered between stages,
+        so a stage that stops reading early stops the stages before it.
+        Error messages are printed straight to the output, like stderr.
+        Every line passed between stages or into a file first checks that
+        the job has not been cancelled. isatty() is only meaningful while
+        a handler is being called, not while its generator is being
+        consumed.
+
+        Args:
+            pipeline (Pipeline): The parsed command line.
+            job (Job): The job the pipeline runs as, if any, returned by
+                current_job() on this thread until it finishes.
+        """
+        previous_job = self.current_job()
+        self._exec_state.job = job or previous_job
+        try:
+            self._run_stages(pipeline)
+        finally:
+            self._exec_state.job = previous_job
+            self._commit_file_system()
+
+    def _run_stages(self, pipeline):
+        stream = None
+        for index, command in enumerate(pipeline.commands):
+            is_last = index == len(pipeline.commands) - 1
+            self._exec_state.isatty = self.output_isatty and is_last and command.stdout is None
+            handler = self.commands.get(command.argv[0])
+            if handler is None:
+                self.error(f"bash: {command.argv[0]}: command not found")
+                stream = None
+                continue
+
+            stdin = self._cancellable(stream)
+            if command.stdin is not None:
+                try:
+                    node = self.file_system.resolve(command.stdin, self.current_directory)
+                    if node.is_dir:
+                        raise VFSError(f"'{command.stdin}' is a directory.")
+                except VFSError as e:
+                    self.error(f"bash: {e}")
+                    stream = None
+                    continue
+                stdin = self._cancellable(node.content.iter_lines())
+
+            output = handler(command.argv[1:], stdin)
+            stream = _split_lines(output) if output is not None else None
+            if command.stdout is not None:
+                self._redirect(stream, command.stdout, command.append)
+                stream = None
+
+        if stream is not None:
+            for line in self._cancellable(stream):
+                self.print_output(line)
+
+    def _redirect(self, lines, path, append):
+        """Streams lines into a file in the virtual filesystem."""
+        try:
+            node = self.file_system.open_for_write(path, self.current_directory, append)
+        except VFSError as e:
+            self.error(f"bash: {e}")
+            return
+        for line in self._cancellable(lines) or ():
+            self.file_system.write(node, f"{line}\n")
+
+    def run_script(self, lines, name):
+        """
+        Runs command lines in batch, as `source` and `terminal.py --script` do.
+
+        Every line is parsed before any command runs. Neither the commands
+        nor their confirmation messages are echoed, and the changes are
+        committed once at the end. A trailing '&' is ignored. Scripts
+        sourced from a script add to its totals, so one summary line is
+        printed when the outermost finishes. Run as a job, the script stops
+        between commands once the job is cancelled.
+
+        Args:
+            lines (iterable): The script's lines.
+            name (str): The script name used in messages.
+
+        Returns:
+            int: The number of lines that failed to parse or whose command
+                reported an error, including those of nested scripts.
+        """
+        state = self._exec_state
+        depth = self._script_depth()
+        if depth >= self.MAX_SOURCE_DEPTH:
+            self.print_output(f"{name}: maximum source depth exceeded")
+            state.script_stats["errors"] += 1
+            return 1
+        if not depth:
+            state.script_stats = {"commands": 0, "errors": 0}
+        stats = state.script_stats
+
+        start = time.perf_counter()
+        errors_before = stats["errors"]
+        pipelines = []
+        for number, line in self._cancellable(enumerate(lines, 1)):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                pipeline = parse(line)
+            except ParseError as e:
+                self.print_output(f"{name}: line {number}: {e}")
+                stats["errors"] += 1
+                continue
+            if pipeline.commands[0].argv:
+                pipelines.append(pipeline)
+
+        # A nested script counts its own failed lines, so the `source`
+        # line running it only fails if the script itself can't be read
+        outer_failed = getattr(state, "failed", False)
+        state.script_depth = depth + 1
+        try:
+            for pipeline in self._cancellable(pipelines):
+                stats["commands"] += 1
+                state.failed = False
+                with self.file_system.lock:
+                    self._run_stages(pipeline)
+                if state.failed:
+                    stats["errors"] += 1
+        finally:
+            state.script_depth = depth
+            state.failed = outer_failed
+            self._commit_file_system()
+
+        if not depth:
+            self.print_output(
+                f"{name}: ran {stats['commands']} commands in "
+                f"{time.perf_counter() - start:.2f} s, {stats['errors']} errors")
+        return stats["errors"] - errors_before
+
+    def error(self, text):
+        """Prints an error message and marks the running command as failed."""
+        self._exec_state.failed = True
+        self.print_output(text)
+
+    def _notice(self, text):
+        """Prints a confirmation message, which scripts leave out."""
+        if not self._script_depth():
+            self.print_output(text)
+
+    def _script_depth(self):
+        """Returns how many scripts deep the calling thread is running."""
+        return getattr(self._exec_state, "script_depth", 0)
+
+    def isatty(self):
+        """Returns True if the running command's output goes to the screen."""
+        return getattr(self._exec_state, "isatty", self.output_isatty)
+
+    def current_job(self):
+        """Returns the job running on the calling thread, if any."""
+        return getattr(self._exec_state, "job", None)
+
+    def _search_index(self):
+        """Returns the filesystem's search index; building it can be cancelled."""
+        job = self.current_job()
+        return self.file_system.get_search_index(job.check if job is not None else None)
+
+    def _cancellable(self, items):
+        """
+        Returns an iterator over items that raises CommandCancelled once the
+        running job is cancelled, so commands that read a lot without
+        printing anything still stop on Ctrl-C. Returns items unchanged
+        when there is no job.
+        """
+        job = self.current_job()
+        if job is None or items is None:
+            return items
+        return _until_cancelled(items, job)
+
+    # --- Command Handler Methods ---
+
+    def _cmd_help(self, args, stdin):
+        if not args:
+            yield "Available commands:"
+            for summary, usage in self.help_topics.values():
+                yield f"  - {summary}"
+            yield "Commands can be joined with '|' and redirected with '<', '>' and '>>'."
+        elif args[0] in self.help_topics:
+            yield self.help_topics[args[0]][1]
+        else:
+            yield f"Help: No help topic for '{args[0]}'"
+
+    def _cmd_echo(self, args, stdin):
+        yield " ".join(args)
+
+    def _cmd_ls(self, args, stdin):
+        path = args[0] if args else "."
+        try:
+            node = self.file_system.resolve(path, self.current_directory)
+        except VFSError as e:
+            self.error(f"Error: {e}")
+            return None
+
+        if not node.is_dir:
+            return [node.name]
+
+        children = list(node.children.items())
+        dirs = [name for name, child in children if child.is_dir]
+        files = [name for name, child in children if not child.is_dir]
+        if not self.isatty():
+            # One plain name per line when piped or redirected, like GNU ls
+            return sorted(dirs + files)
+        if dirs or files:
+            return [" ".join(f"\033[94m{d}\033[0m" for d in sorted(
+                dirs)) + " " + " ".join(sorted(files))]
+        return [""]
+
+    def _cmd_cd(self, args, stdin):
+        if not args:
+            self.current_directory = self.home_directory
+            return
+
+        try:
+            self.current_directory = self.file_system.resolve_dir(
+                args[0], self.current_directory)
+        except VFSError as e:
+            self.error(f"Error: {e}")
+
+    def _cmd_source(self, args, stdin):
+        if not args:
+            self.error("Usage: source [file]")
+            return
+        node = self._open_file(args[0])
+        if node is not None:
+            self.run_script(list(node.content.iter_lines()), args[0])
+
+    def _cmd_date(self, args, stdin):
+        now = datetime.datetime.now()
+        yield now.strftime("%A, %B %d, %Y %H:%M:%S")
+
+    def _cmd_sysinfo(self, args, stdin):
+        yield "HomeOS (Python Terminal) v1.0.0"
+        yield "OS Name: Python-based Simulated Environment"
+        yield "Kernel: 5.15.0-76-generic (simulated)"
+        yield f"Uptime: {datetime.timedelta(seconds=int(procstats.uptime_seconds()))}"
+        rss = procstats.rss_bytes()
+        yield f"Memory: {procstats.format_bytes(rss) if rss is not None else 'unknown'} resident"
+        yield f"CPU time: {procstats.cpu_seconds():.2f} s in {procstats.thread_count()} threads"
+
+    def _cmd_mkdir(self, args, stdin):
+        parents = "-p" in args
+        names = [arg for arg in args if arg != "-p"]
+        if not names:
+            self.error("Error: Please specify a directory name.")
+            return
+
+        for new_dir_name in names:
+            try:
+                self.file_system.mkdir(
+                    new_dir_name, self.current_directory, parents=parents)
+            except VFSError as e:
+                self.error(f"Error: {e}")
+            else:
+                self._notice(f"Directory '{new_dir_name}' created.")
+
+    def _cmd_touch(self, args, stdin):
+        if not args:
+            self.error("Error: Please specify a file name.")
+            return
+
+        new_file_name = args[0]
+        try:
+            parent, name = self.file_system.resolve_parent(
+                new_file_name, self.current_directory)
+            if name in parent.children:
+                self.error(
+                    f"Error: File or directory '{new_file_name}' already exists.")
+                return
+            self.file_system.touch(new_file_name, self.current_directory)
+        except VFSError as e:
+            self.error(f"Error: {e}")
+        else:
+            self._notice(f"File '{new_file_name}' created.")
+
+    def _cmd_rm(self, args, stdin):
+        if not args:
+            self.error("Error: Please specify a file name.")
+            return
+
+        file_to_remove = args[0]
+        try:
+            self.file_system.remove(file_to_remove, self.current_directory)
+        except VFSError:
+            self.error(
+                f"Error: File '{file_to_remove}' not found or is a directory.")
+        else:
+            self._notice(f"File '{file_to_remove}' removed.")
+
+    def _cmd_rmdir(self, args, stdin):
+        if not args:
+            self.error("Error: Please specify a directory name.")
+            return
+
+        dir_to_remove = args[0]
+        try:
+            node = self.file_system.resolve(
+                dir_to_remove, self.current_directory)
+            if node is self.current_directory or node is self.home_directory:
+                self.error(
+                    f"Error: Cannot remove '{dir_to_remove}': directory is in use.")
+                return
+            self.file_system.rmdir(dir_to_remove, self.current_directory)
+        except VFSError as e:
+            self.error(f"Error: {e}")
+        else:
+            self._notice(f"Directory '{dir_to_remove}' removed.")
+
+    def _cmd_whoami(self, args, stdin):
+        yield self.user
+
+    def _cmd_ping(self, args, stdin):
+        if not args:
+            self.error(
+                "Usage: ping [ip/host]\nSimulates sending data packets to a network host.")
+            return
+
+        host = args[0]
+        job = self.current_job()
+        yield f"PING {host} ({host}): 56 data bytes"
+        for i in range(4):
+            if i and job is not None:
+                job.sleep(1)  # One packet per second, like the real ping
+            yield (
+                f"64 bytes from {host}: icmp_seq={i+1} ttl=64 time={random.randint(10, 50)} ms")
+
+    def _cmd_ifconfig(self, args, stdin):
+        yield (
+            "eth0: flags=209<UP,BROADCAST,MULTICAST>  mtu 1500\n"
+            "        inet 192.168.1.10  netmask 255.255.255.0  broadcast 192.168.1.255\n"
+            "        ether 00:11:22:33:44:55  txqueuelen 1000  (Ethernet)\n"
+            "lo: flags=73<UP,LOOPBACK,RUNNING>  mtu 65536\n"
+            "        inet 127.0.0.1  netmask 255.0.0.0"
+        )
+
+    def _cmd_history(self, args, stdin):
+        count = int(args[0]) if args and args[0].isdigit() else 20
+        if self.history is None:
+            return
+        total = len(self.history)
+        for position in range(max(0, total - count), total):
+            yield f"{position + 1:5}  {self.history[position]}"
+
+    def _open_file(self, path):
+        """Returns the file node at a path, or prints an error and returns None."""
+        try:
+            node = self.file_system.resolve(path, self.current_directory)
+        except VFSError as e:
+            self.error(f"Error: {e}")
+            return None
+        if node.is_dir:
+            self.error(f"Error: '{path}' is a directory.")
+            return None
+        return node
+
+    def _line_count_option(self, args, usage):
+        """Parses an optional leading '-n N'; returns (count, files) or None."""
+        if args and args[0] == "-n":
+            if len(args) < 2 or not args[1].isdigit():
+                self.error(usage)
+                return None
+            return int(args[1]), args[2:]
+        return 10, args
+
+    def _cmd_cat(self, args, stdin):
+        if not args:
+            yield from stdin or ()
+            return
+        for path in args:
+            node = self._open_file(path)
+            if node is not None:
+                yield from node.content.iter_lines()
+
+    def _cmd_grep(self, args, stdin):
+        flags = set()
+        operands = []
+        for index, arg in enumerate(args):
+            if arg == "--":
+                operands.extend(args[index + 1:])  # A pattern starting with '-'
+                break
+            if arg.startswith("-") and len(arg) > 1:
+                flags.update(f"-{letter}" for letter in arg[1:])  # "-ri" is "-r -i"
+            else:
+                operands.append(arg)
+        if not operands or not flags <= {"-i", "-v", "-r"}:
+            self.error("Usage: grep [-i] [-v] [-r] PATTERN [file...]")
+            return
+        try:
+            pattern = re.compile(
+                operands[0], re.IGNORECASE if "-i" in flags else 0)
+        except re.error as e:
+            self.error(f"grep: invalid pattern: {e}")
+            return
+
+        invert = "-v" in flags
+        if "-r" in flags:
+            yield from self._grep_recursive(
+                operands[0], pattern, invert, "-i" in flags, operands[1:] or ["."])
+            return
+        if len(operands) == 1:
+            sources = [("", stdin or ())]
+        else:
+            sources = []
+            for path in operands[1:]:
+                node = self._open_file(path)
+                if node is not None:
+                    prefix = f"{path}:" if len(operands) > 2 else ""
+                    sources.append((prefix, node.content.iter_lines()))
+
+        for prefix, lines in sources:
+            for line in lines:
+                if bool(pattern.search(line)) != invert:
+                    yield prefix + line
+
+    def _grep_recursive(self, text, pattern, invert, ignore_case, paths):
+        """
+        Searches every file under the given paths. Literal patterns only
+        scan the files the content index says may contain them.
+        """
+        index = self._search_index()
+        candidates = None if invert else index.content_candidates(text, ignore_case)
+        for path in paths:
+            try:
+                top = self.file_system.resolve(path, self.current_directory)
+            except VFSError as e:
+                self.error(f"Error: {e}")
+                continue
+            if candidates is None:
+                files = [node for node in self._cancellable(self.file_system.walk(top))
+                         if not node.is_dir]
+            else:
+                files = [node for node in candidates if self._is_under(node, top)]
+            for node in sorted(files, key=self.file_system.path_of):
+                name = self.file_system.path_of(node)
+                for line in self._cancellable(node.content.iter_lines()):
+                    if bool(pattern.search(line)) != invert:
+                        yield f"{name}:{line}"
+
+    def _is_under(self, node, top):
+        """Returns True if node is top or one of its descendants."""
+        root = self.file_system.root
+        while node is not top:
+            if node is root:
+                return False
+            node = node.parent
+        return True
+
+    def _cmd_find(self, args, stdin):
+        usage = "Usage: find [path...] [-name GLOB] [-type f|d]"
+        paths = []
+        name_glob = node_type = None
+        i = 0
+        while i < len(args):
+            if args[i] in ("-name", "-type") and i + 1 < len(args):
+                if args[i] == "-name":
+                    name_glob = args[i + 1]
+                else:
+                    node_type = args[i + 1]
+                i += 2
+            elif args[i].startswith("-"):
+                self.error(usage)
+                return
+            else:
+                paths.append(args[i])
+                i += 1
+        if node_type not in (None, "f", "d"):
+            self.error(usage)
+            return
+
+        for path in paths or ["."]:
+            try:
+                top = self.file_system.resolve(path, self.current_directory)
+            except VFSError as e:
+                self.error(f"Error: {e}")
+                continue
+            if name_glob is None:
+                nodes = self.file_system.walk(top)
+            else:
+                # Look the name up in the index instead of walking the tree
+                index = self._search_index()
+                nodes = (node for node in index.find_names(name_glob)
+                         if self._is_under(node, top))
+            matches = []
+            for node in self._cancellable(nodes):
+                if node_type == "f" and node.is_dir or node_type == "d" and not node.is_dir:
+                    continue
+                matches.append(self.file_system.path_of(node))
+            yield from sorted(matches)
+
+    def _cmd_head(self, args, stdin):
+        parsed = self._line_count_option(args, "Usage: head [-n N] [file]")
+        if parsed is None:
+            return
+        count, files = parsed
+        if files:
+            node = self._open_file(files[0])
+            if node is None:
+                return
+            lines = node.content.iter_lines()
+        else:
+            lines = stdin or ()
+
+        for index, line in enumerate(lines):
+            if index >= count:
+                break
+            yield line
+
+    def _cmd_tail(self, args, stdin):
+        parsed = self._line_count_option(args, "Usage: tail [-n N] [file]")
+        if parsed is None:
+            return
+        count, files = parsed
+        if files:
+            node = self._open_file(files[0])
+            if node is not None:
+                # Seeks backwards from the end instead of reading the file
+                yield from node.content.tail_lines(count)
+        elif count:
+            yield from deque(stdin or (), maxlen=count)
+
+    def _cmd_wc(self, args, stdin):
+        flags = {arg for arg in args if arg in ("-l", "-w", "-c")}
+        files = [arg for arg in args if arg not in flags]
+        flags = flags or {"-l", "-w", "-c"}
+
+        def format_counts(lines, words, size, name):
+            counts = [count for flag, count in (("-l", lines), ("-w", words), ("-c", size))
+                      if flag in flags]
+            return " ".join(f"{count:7}" for count in counts) + (f" {name}" if name else "")
+
+        if not files:
+            lines = words = size = 0
+            for line in stdin or ():
+                lines += 1
+                words += len(line.split())
+                size += len(line.encode("utf-8")) + 1
+            yield format_counts(lines, words, size, "")
+            return
+
+        for path in files:
+            node = self._open_file(path)
+            if node is None:
+                continue
+            lines = words = 0
+            in_word = False
+            for chunk in node.content.iter_chunks():
+                lines += chunk.count(b"\n")
+                words += len(chunk.split())
+                # A word split across two chunks was counted twice
+                if in_word and chunk[:1] and not chunk[:1].isspace():
+                    words -= 1
+                in_word = bool(chunk) and not chunk[-1:].isspace()
+            yield format_counts(lines, words, node.content.size, path)
@@ -1,9 +1,12 @@
 import tkinter as tk
 import random
 import os
+from app_lifecycle import AppLifecycle
+from key_router import KeyRouter
+import styles
 
 
-class SnakeGame(tk.Frame):
+class SnakeGame(AppLifecycle, tk.Frame):
     """
     A classic Snake game application built with Tkinter.
     """
@@ -57,7 +60,7 @@ class SnakeGame(tk.Frame):
         self.score_label = tk.Label(
             self.button_frame,
             text="Score: 0",
-            font=("Helvetica", 16, "bold"),
+            font=styles.preset(self, "heading"),
             bg=self.BG_COLOR,
             fg=self.SCORE_COLOR
         )
@@ -67,7 +70,7 @@ class SnakeGame(tk.Frame):
             self.button_frame,
             text="Exit Game",
             command=self._exit_game_and_close,
-            font=("Helvetica", 12),
+            font=styles.preset(self, "body"),
             bg=self.BUTTON_COLOR,
             fg=self.BUTTON_FG,
             relief="raised",
@@ -75,13 +78,6 @@ class SnakeGame(tk.Frame):
         )
         self.exit_button.pack(side="right", padx=20)
 
-        # --- Event Bindings ---
-        # The key bindings are now on the frame itself
-        self.bind_all("<Left>", self._change_direction)
-        self.bind_all("<Right>", self._change_direction)
-        self.bind_all("<Up>", self._change_direction)
-        self.bind_all("<Down>", self._change_direction)
-
         self._show_start_menu()
 
     def _load_highscores(self):
@@ -104,19 +100,19 @@ class SnakeGame(tk.Frame):
         self.menu_frame.place(relx=0.5, rely=0.5, anchor="center")
 
         # Welcome text
-        tk.Label(self.menu_frame, text="Snake Game", font=(
-            "Helvetica", 24, "bold"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack(pady=10)
+        tk.Label(self.menu_frame, text="Snake Game", font=styles.preset(
+            self, "title"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack(pady=10)
 
         # High scores leaderboard
-        tk.Label(self.menu_frame, text="High Scores", font=(
-            "Helvetica", 16, "bold"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack(pady=(20, 5))
+        tk.Label(self.menu_frame, text="High Scores", font=styles.preset(
+            self, "heading"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack(pady=(20, 5))
         for i, score in enumerate(sorted(self.highscores, reverse=True)[:5]):
-            tk.Label(self.menu_frame, text=f"{i+1}. {score}", font=(
-                "Helvetica", 12), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack()
+            tk.Label(self.menu_frame, text=f"{i+1}. {score}", font=styles.preset(
+                self, "body"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack()
 
         # Start button
-        tk.Button(self.menu_frame, text="Start Game", command=self._start_game, font=("Helvetica", 12,
-                  "bold"), bg=self.BUTTON_COLOR, fg=self.BUTTON_FG, relief="raised", cursor="hand2").pack(pady=20)
+        tk.Button(self.menu_frame, text="Start Game", command=self._start_game, font=styles.preset(self,
+                  "body-bold"), bg=self.BUTTON_COLOR, fg=self.BUTTON_FG, relief="raised", cursor="hand2").pack(pady=20)
 
     def _start_game(self):
         """Resets the game state and starts the game loop."""
@@ -137,6 +133,11 @@ class SnakeGame(tk.Frame):
             0, (self.HEIGHT // self.GRID_SIZE) - 1) * self.GRID_SIZE
         return (x, y)
 
+    def register_keys(self, router):
+        # Only the last arrow pressed before the next frame matters
+        for key in ("<Left>", "<Right>", "<Up>", "<Down>"):
+            router.bind(self, key, self._change_direction, coalesce=True)
+
     def _change_direction(self, event):
         """Changes the direction of the snake based on key press."""
         if not self.running:
@@ -193,19 +194,19 @@ class SnakeGame(tk.Frame):
         self._save_highscores()
 
         self.menu_frame.place(relx=0.5, rely=0.5, anchor="center")
-        tk.Label(self.menu_frame, text="Game Over", font=(
-            "Helvetica", 24, "bold"), bg=self.MENU_BG, fg=self.GAME_OVER_COLOR).pack(pady=10)
-        tk.Label(self.menu_frame, text=f"Your Score: {self.score}", font=(
-            "Helvetica", 16), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack(pady=5)
+        tk.Label(self.menu_frame, text="Game Over", font=styles.preset(
+            self, "title"), bg=self.MENU_BG, fg=self.GAME_OVER_COLOR).pack(pady=10)
+        tk.Label(self.menu_frame, text=f"Your Score: {self.score}", font=styles.preset(
+            self, "large"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack(pady=5)
 
         # Display high scores
-        tk.Label(self.menu_frame, text="High Scores", font=(
-            "Helvetica", 14, "bold"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack(pady=(10, 5))
+        tk.Label(self.menu_frame, text="High Scores", font=styles.preset(
+            self, "subheading"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack(pady=(10, 5))
         for i, score in enumerate(self.highscores):
-            tk.Label(self.menu_frame, text=f"{i+1}. {score}", font=(
-                "Helvetica", 12), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack()
+            tk.Label(self.menu_frame, text=f"{i+1}. {score}", font=styles.preset(
+                self, "body"), bg=self.MENU_BG, fg=self.SCORE_COLOR).pack()
 
-        tk.Button(self.menu_frame, text="Play Again", command=self._start_game, font=("Helvetica", 12, "bold"),
+        tk.Button(self.menu_frame, text="Play Again", command=self._start_game, font=styles.preset(self, "body-bold"),
                   bg=self.BUTTON_COLOR, fg=self.BUTTON_FG, relief="raised", cursor="hand2").pack(pady=(20, 10))
 
     def _game_loop(self):
@@ -242,7 +243,8 @@ class SnakeGame(tk.Frame):
             fill=self.FOOD_COLOR, outline=self.BG_COLOR
         )
 
-        self.master.after(100, self._game_loop)
+        # Paused automatically while the game is hidden
+        self.timers.after(100, self._game_loop)
 
     def _exit_game_and_close(self):
         """Stops the game loop and closes the game frame."""
@@ -258,5 +260,6 @@ if __name__ == "__main__":
     def close_game():
         root.destroy()
     game = SnakeGame(root, on_close=close_game)
+    game.register_keys(KeyRouter(root, lambda: game))
     game.pack(fill="both", expand=True)
     root.mainloop()
@@ -0,0 +1,83 @@
+from tkinter import font
+
+# Named text styles shared by every app, as (family, size, weight, slant)
+PRESETS = {
+    "title": ("Helvetica", 24, "bold", "roman"),
+    "subtitle": ("Helvetica", 20, "bold", "roman"),
+    "heading": ("Helvetica", 16, "bold", "roman"),
+    "subheading": ("Helvetica", 14, "bold", "roman"),
+    "large": ("Helvetica", 16, "normal", "roman"),
+    "body": ("Helvetica", 12, "normal", "roman"),
+    "body-bold": ("Helvetica", 12, "bold", "roman"),
+    "small": ("Helvetica", 10, "normal", "roman"),
+    "monospace": ("Consolas", 12, "normal", "roman"),
+    "monospace-bold": ("Consolas", 12, "bold", "roman"),
+}
+
+
+class StyleCache:
+    """
+    Fonts and the font-family list for one Tk interpreter.
+
+    Every font is created once as a named Font, so widgets refer to it by
+    name and Tk never parses a font description again. The fonts are
+    shared: configuring one changes every widget that uses it, so an app
+    that needs a font it can change should create its own.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._fonts = {}
+        self._families = None
+
+    def font(self, family, size, weight="normal", slant="roman"):
+        key = (family, size, weight, slant)
+        named = self._fonts.get(key)
+        if named is None:
+            named = self._fonts[key] = font.Font(
+                self.root, family=family, size=size, weight=weight, slant=slant)
+        return named
+
+    def preset(self, name):
+        return self.font(*PRESETS[name])
+
+    def families(self):
+        """Returns the installed font families, sorted. Listing them is slow, so it is done once."""
+        if self._families is None:
+            self._families = tuple(sorted(font.families(self.root)))
+        return self._families
+
+    def has_family(self, family):
+        """
+        Returns whether a font family is installed, without listing every
+        family unless they have already been listed.
+        """
+        if self._families is not None:
+            return family in self._families
+        return self.font(family, 12).actual("family").lower() == family.lower()
+
+    def prefetch(self, delay_ms=0):
+        """Lists the font families when Tk is next idle after `delay_ms`, ahead of first use."""
+        self.root.after(delay_ms, lambda: self.root.after_idle(self.families))
+
+
+def cache_for(widget):
+    """Returns the StyleCache of a widget's Tk interpreter, creating it on first use."""
+    root = widget._root()
+    cache = getattr(root, "_style_cache", None)
+    if cache is None:
+        cache = root._style_cache = StyleCache(root)
+    return cache
+
+
+def preset(widget, name):
+    """Returns the shared Font of a preset, e.g. preset(self, "heading")."""
+    return cache_for(widget).preset(name)
+
+
+def shared_font(widget, family, size, weight="normal", slant="roman"):
+    return cache_for(widget).font(family, size, weight, slant)
+
+
+def font_families(widget):
+    return cache_for(widget).families()
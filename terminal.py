@@ -1,15 +1,110 @@
-import tkinter as tk
-from tkinter import font, ttk
+import argparse
 import datetime
+import sys
+import time
+import tkinter as tk
+from tkinter import ttk
+import queue
+import threading
+from collections import deque
+import ansi
+import app_monitor
+from app_lifecycle import AppLifecycle
+import boot_trace
+import styles
+import procstats
+from cmdline import ParseError, parse
+from concurrent.futures import ThreadPoolExecutor
+from history import CommandHistory
+from output_view import OutputView
+from shell import CommandCancelled, Job, Shell
+from vfs_store import VFSStore
+
+
+class ScrollbackBuffer:
+    """
+    Tracks the size of every line of terminal output so the oldest lines
+    can be trimmed without measuring the stored output.
 
+    The buffer trims in bulk: once a limit is exceeded it drops enough old
+    lines to get back under `TRIM_RATIO` of the limit, so trimming happens
+    once per many inserts rather than on every one.
+    """
 
-class TerminalApp(tk.Frame):
+    TRIM_RATIO = 0.9
+
+    # The output view only lays out what is on screen, so the limits only
+    # bound memory use
+    def __init__(self, max_lines=1000000, max_bytes=64 * 1024 * 1024):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.reset()
+
+    def reset(self):
+        """Forgets all tracked lines, matching an empty Text widget."""
+        self.line_sizes = deque([0])
+        self.total_bytes = 0
+
+    def append(self, text):
+        """Records text appended at the end of the widget."""
+        lines = text.split("\n")
+        first = len(lines[0].encode("utf-8"))
+        self.line_sizes[-1] += first
+        self.total_bytes += first
+        for line in lines[1:]:
+            # Each new line also costs the newline character before it
+            size = len(line.encode("utf-8")) + 1
+            self.line_sizes.append(size)
+            self.total_bytes += size
+
+    def remove_last(self, count):
+        """Forgets the newest `count` lines, reopening the line before them."""
+        for _ in range(min(count, len(self.line_sizes) - 1)):
+            self.total_bytes -= self.line_sizes.pop()
+
+    def lines_to_trim(self):
+        """
+        Returns how many of the oldest lines should be removed, dropping
+        them from the tracked sizes. Returns 0 when within limits.
+        """
+        over_lines = self.max_lines and len(self.line_sizes) > self.max_lines
+        over_bytes = self.max_bytes and self.total_bytes > self.max_bytes
+        if not (over_lines or over_bytes):
+            return 0
+
+        target_lines = int(self.max_lines * self.TRIM_RATIO) if self.max_lines else None
+        target_bytes = int(self.max_bytes * self.TRIM_RATIO) if self.max_bytes else None
+        count = 0
+        # Always keep the last line, which is still being written to
+        while len(self.line_sizes) > 1 and (
+                (target_lines is not None and len(self.line_sizes) > target_lines) or
+                (target_bytes is not None and self.total_bytes > target_bytes)):
+            self.total_bytes -= self.line_sizes.popleft()
+            count += 1
+        if count:
+            # The new first line no longer has a newline before it
+            self.line_sizes[0] -= 1
+            self.total_bytes -= 1
+        return count
+
+
+class TerminalApp(AppLifecycle, tk.Frame):
     """
     A more advanced terminal emulator for our simulated HomeOS,
     with a Linux-like feel and improved functionality.
     """
 
-    def __init__(self, master, on_close, username, launch_app_callback):
+    # Commands that touch widgets or shell state and so run on the Tk thread
+    MAIN_THREAD_COMMANDS = {"clear", "cd", "pydocs", "snake", "exit",
+                            "scrollback", "history", "jobs", "fg"}
+    # How often queued output from worker threads is drained, in ms
+    OUTPUT_POLL_MS = 16
+    # How long one step of a Ctrl-F output search may hold the Tk thread, in
+    # ms, and how many lines it scans between looking at the clock
+    SEARCH_SLICE_MS = 20
+    SEARCH_BATCH_LINES = 5000
+
+    def __init__(self, master, on_close, username, launch_app_callback, monitor=None):
         """
         Initializes the terminal frame.
 
@@ -18,6 +113,7 @@ class TerminalApp(tk.Frame):
             on_close (callable): A function to call when the terminal is closed.
             username (str): The logged-in username.
             launch_app_callback (callable): A function to call to launch other applications.
+            monitor (AppMonitor): The desktop's app monitor, shown by `top` and `ps`.
         """
         # Define a consistent color scheme for better aesthetics
         self.bg_color = "#1e1e1e"  # Deep charcoal background
@@ -29,44 +125,64 @@ class TerminalApp(tk.Frame):
         super().__init__(master, bg=self.bg_color)
         self.on_close = on_close
         self.launch_app_callback = launch_app_callback
+        self.monitor = monitor
 
         self.user = username
-        self.hostname = "homeos"
-
-        # Mock file system for the `ls` and `cd` commands.
-        self.file_system = {
-            "root": {"dirs": ["home", "bin", "etc", "var"], "files": []},
-            "home": {"dirs": ["user", "guest"], "files": ["profile.txt"]},
-            "bin": {"dirs": [], "files": ["echo", "clear", "ls", "help", "exit", "date", "sysinfo", "mkdir", "touch", "whoami"]},
-            "etc": {"dirs": [], "files": ["passwd", "hosts"]},
-            "var": {"dirs": [], "files": ["log.txt"]},
-            "user": {"dirs": ["documents", "downloads"], "files": ["welcome.txt"]},
-            "guest": {"dirs": [], "files": []},
-            "documents": {"dirs": [], "files": ["my_document.txt"]},
-            "downloads": {"dirs": [], "files": []}
-        }
-        self.current_directory = "home"
-        self.home_directory = "home"
-        self.command_history = []
-        self.history_index = -1
+
+        self.command_history = CommandHistory(self.user)
+        # Position while browsing history with Up/Down; None means a new line
+        self.history_index = None
+        # Incremental reverse search state (Ctrl-R), None when not searching
+        self._search = None
+
+        # Pending terminal output, flushed to the Text widget once per idle cycle
+        self._output_buffer = []
+        self._flush_id = None
+        self.scrollback = ScrollbackBuffer()
+
+        # Command execution engine: handlers run on a worker pool and send
+        # their output back through a queue drained on the Tk thread
+        self._ui_thread = threading.current_thread()
+        self._executor = ThreadPoolExecutor(
+            max_workers=4, thread_name_prefix="terminal-job")
+        self._output_queue = queue.Queue()
+        self._drain_id = None
+        self.jobs = {}
+        self.foreground_job = None
+        self._next_job_id = 1
+
+        # The command interpreter, with the filesystem restored from disk
+        self.shell = Shell(self.user, self.print_output, VFSStore(), self.command_history)
 
         # Use a monospace font for a classic terminal look
-        self.terminal_font = font.Font(family="Consolas", size=12)
+        self.terminal_font = styles.preset(self, "monospace")
 
-        # Create the main text display area for the terminal output
-        self.text_area = tk.Text(
+        # Create the main text display area for the terminal output. Only
+        # the lines on screen are put in the Text widget; the rest of the
+        # output is kept in the view's line store.
+        self.output_view = OutputView(
             self,
             bg=self.bg_color,
             fg=self.fg_color,
             insertbackground=self.cursor_color,
             font=self.terminal_font,
-            state="disabled",
             relief="flat",
             wrap="word",
             padx=10,
             pady=10
         )
-        self.text_area.pack(expand=True, fill="both")
+        self.output_view.pack(expand=True, fill="both")
+        self.text_area = self.output_view.text
+
+        # Colour escapes in the output become Text tags. The 16 basic colours
+        # are configured up front and any other colour on first use.
+        self.ansi_parser = ansi.AnsiParser()
+        self.bold_font = styles.preset(self, "monospace-bold")
+        self.text_area.tag_config(ansi.BOLD, font=self.bold_font)
+        self.text_area.tag_config(ansi.UNDERLINE, underline=True)
+        self._configured_tags = {ansi.BOLD, ansi.UNDERLINE}
+        for color in ansi.PALETTE:
+            self._configure_tags(("fg" + color, "bg" + color))
 
         # --- BUG FIX: Bind a mouse click event to always set focus to the input area. ---
         self.text_area.bind('<Button-1>', self._refocus_input)
@@ -86,8 +202,11 @@ class TerminalApp(tk.Frame):
         self.prompt_label.pack(side="left")
 
         # Create the input entry field where the user types
+        self.input_var = tk.StringVar()
+        self.input_var.trace_add("write", self._search_query_changed)
         self.input_area = tk.Entry(
             self.input_frame,
+            textvariable=self.input_var,
             bg=self.bg_color,
             fg=self.input_fg_color,
             font=self.terminal_font,
@@ -103,27 +222,57 @@ class TerminalApp(tk.Frame):
         self.input_area.bind('<Tab>', self._tab_completion)
         self.input_area.bind('<Up>', self._history_up)
         self.input_area.bind('<Down>', self._history_down)
-
-        # Dictionary of command handlers for a clean and scalable approach
-        self.commands = {
-            "clear": self._cmd_clear,
-            "help": self._cmd_help,
-            "echo": self._cmd_echo,
-            "ls": self._cmd_ls,
-            "cd": self._cmd_cd,
-            "date": self._cmd_date,
-            "sysinfo": self._cmd_sysinfo,
-            "mkdir": self._cmd_mkdir,
-            "touch": self._cmd_touch,
-            "whoami": self._cmd_whoami,
-            "pydocs": self._cmd_pydocs,
-            "snake": self._cmd_snake,
-            "rm": self._cmd_rm,
-            "rmdir": self._cmd_rmdir,
-            "ping": self._cmd_ping,
-            "ifconfig": self._cmd_ifconfig,
-            "exit": self._cmd_exit
-        }
+        self.input_area.bind('<Control-r>', self._reverse_search)
+        self.input_area.bind('<Control-f>', self._output_search)
+        self.input_area.bind('<Control-g>', self._cancel_search)
+        self.input_area.bind('<Escape>', self._cancel_search)
+        self.input_area.bind('<Control-c>', self._interrupt)
+
+        # Commands that need the terminal window or the desktop
+        self.shell.register_command(
+            "clear", self._on_tk_thread(self._cmd_clear),
+            "clear          Clears the terminal screen",
+            "Usage: clear\nClears all text from the terminal screen.")
+        self.shell.register_command(
+            "pydocs", self._on_tk_thread(self._cmd_pydocs),
+            "pydocs         Launches the Pydocs application",
+            "Usage: pydocs\nLaunches the Pydocs word processor application.")
+        self.shell.register_command(
+            "snake", self._on_tk_thread(self._cmd_snake),
+            "snake          Launches the Snake game",
+            "Usage: snake\nLaunches the classic Snake game.")
+        self.shell.register_command(
+            "scrollback", self._on_tk_thread(self._cmd_scrollback),
+            "scrollback     Shows or changes the scrollback limits",
+            "Usage: scrollback [lines|bytes N]\nShows the scrollback usage and limits, or sets a limit. A limit of 0 means unlimited. Press Ctrl-F to search the whole scrollback as you type; Ctrl-F again finds earlier matches, Escape cancels.")
+        self.shell.register_command(
+            "top", self._cmd_top,
+            "top [-d secs]  Shows live CPU, memory and event-loop use per app",
+            "Usage: top [-m] [-d seconds] [-n count]\nShows the HomeOS process's uptime, memory and CPU use, and for each app its pending after() callbacks and the time spent in its Tk callbacks. The display refreshes in place every 2 seconds, or as often as '-d' says, until Ctrl-C or until it has been drawn '-n' times. '-m' also traces memory allocations while top runs and shows how much each app has allocated since it started; tracing slows HomeOS down, so it stops when top does.")
+        self.shell.register_command(
+            "ps", self._cmd_ps,
+            "ps             Lists the apps and their resource use",
+            "Usage: ps\nLists each app with its pending after() callbacks, Tk callback count and total time and slowest callback since HomeOS started, and the memory it has allocated while 'top -m' is running.")
+        self.shell.register_command(
+            "boot-trace", self._cmd_boot_trace,
+            "boot-trace     Shows where HomeOS's startup time went",
+            "Usage: boot-trace [-a] [--json]\nShows the startup timeline recorded when HomeOS is started with --boot-trace or HOMEOS_BOOT_TRACE=1: module imports, constructors, first paints and idle points, with nested spans indented. Spans under 1 ms are hidden unless '-a' is given. '--json' prints the Chrome trace-event JSON instead, which can be opened in chrome://tracing or ui.perfetto.dev.")
+        self.shell.register_command(
+            "stalls", self._cmd_stalls,
+            "stalls [-v]    Lists recent freezes of the user interface",
+            "Usage: stalls [-v]\nLists the recent times the Tk event loop was blocked for more than a quarter of a second, with the callback (and app) that was running, then a histogram per app of how long its callbacks held the event loop. '-v' also shows the stack sampled during each stall. Stalls are also logged to ~/.homeos/logs/stalls.log.")
+        self.shell.register_command(
+            "jobs", self._on_tk_thread(self._cmd_jobs),
+            "jobs           Lists background jobs (run one with 'cmd &')",
+            "Usage: jobs\nLists running background jobs. End a command with '&' to run it in the background.")
+        self.shell.register_command(
+            "fg", self._on_tk_thread(self._cmd_fg),
+            "fg [%job]      Brings a background job to the foreground",
+            "Usage: fg [%job]\nBrings a background job (the newest by default) to the foreground, where Ctrl-C cancels it.")
+        self.shell.register_command(
+            "exit", self._on_tk_thread(self._cmd_exit),
+            "exit           Closes the terminal application",
+            "Usage: exit\nCloses the terminal application and returns to the desktop.")
 
         # Print a welcome message
         self.print_output(
@@ -132,8 +281,11 @@ class TerminalApp(tk.Frame):
 
     def _get_prompt(self):
         """Constructs the bash-style prompt string."""
-        path = f"/~{self.current_directory}" if self.current_directory != self.home_directory else "~"
-        return f"{self.user}@{self.hostname}:{path}$ "
+        return self.shell.prompt()
+
+    def on_show(self):
+        super().on_show()
+        self._refocus_input()
 
     def _refocus_input(self, event=None):
         """
@@ -144,90 +296,230 @@ class TerminalApp(tk.Frame):
 
     def print_output(self, text):
         """
-        Writes text to the terminal display.
+        Queues text for the terminal display.
+
+        Writes are coalesced and reach the output view in a single update on
+        the next idle cycle; call flush_output() to show them immediately.
+        Safe to call from command worker threads, where it also serves as
+        the point at which a cancelled command stops.
+        """
+        if threading.current_thread() is not self._ui_thread:
+            job = self.current_job()
+            if job is not None:
+                job.check()
+            self._output_queue.put(("output", text))
+            return
+
+        self._output_buffer.append(f"\n{text}")
+        if self._flush_id is None:
+            self._flush_id = self.after_idle(self.flush_output)
+
+    def replace_output(self, count, lines):
         """
-        self.text_area.config(state="normal")
-        self.text_area.insert(tk.END, f"\n{text}")
-        self.text_area.see(tk.END)
-        self.text_area.config(state="disabled")
+        Replaces the newest `count` lines of output with new lines, for
+        displays that refresh in place such as `top`. Safe to call from
+        command worker threads, like print_output().
+        """
+        if threading.current_thread() is not self._ui_thread:
+            job = self.current_job()
+            if job is not None:
+                job.check()
+            self._output_queue.put(("replace", (count, lines)))
+            return
+
+        self.flush_output()
+        self.output_view.remove_last(count)
+        self.scrollback.remove_last(count)
+        for line in lines:
+            self.print_output(line)
+
+    def flush_output(self):
+        """Writes all pending output to the output view in one update."""
+        if self._flush_id is not None:
+            self.after_cancel(self._flush_id)
+            self._flush_id = None
+        if not self._output_buffer:
+            return
+
+        runs = self.ansi_parser.feed("".join(self._output_buffer))
+        self._output_buffer.clear()
+        if not runs:
+            return
+        for text, tags in runs:
+            if tags:
+                self._configure_tags(tags)
+        self.output_view.append(runs)
+        self.scrollback.append("".join(text for text, tags in runs))
+        self.output_view.trim(self.scrollback.lines_to_trim())
+
+    def _configure_tags(self, tags):
+        """Sets up the colour tags the Text widget hasn't seen yet."""
+        for tag in tags:
+            if tag not in self._configured_tags:
+                self.text_area.tag_config(tag, **ansi.tag_options(tag))
+                self._configured_tags.add(tag)
 
     def handle_command(self, event):
         """
         Processes the command entered by the user.
+
+        Commands run on the worker pool so slow ones don't freeze HomeOS;
+        a trailing '&' runs the command as a background job.
         """
+        if self.foreground_job is not None:
+            self.bell()  # Still waiting for the previous command
+            return "break"
+        if self._search is not None:
+            output_search = self._search["kind"] == "output"
+            self._end_search(accept=True)
+            if output_search:
+                return "break"  # Enter just leaves the output search
         command_line = self.input_area.get().strip()
 
         if command_line:
             self.command_history.append(command_line)
-            self.history_index = len(self.command_history)
+            self.history_index = None
 
         self.input_area.delete(0, tk.END)
 
         if not command_line:
             return
 
-        parts = command_line.split()
-        command = parts[0]
-        args = parts[1:]
-
         # Display the prompt and the command that was just run
-        prompt_text = f"{self.user}@{self.hostname}:/~{self.current_directory}$ {command_line}"
+        self.output_view.scroll_to(len(self.output_view.store))
+        prompt_text = f"{self._get_prompt()}{command_line}"
         self.print_output(f"\033[92m{prompt_text}\033[0m")
-        self.text_area.tag_config('prompt', foreground=self.prompt_fg)
 
-        # Execute the command using the dictionary-based handler
-        handler = self.commands.get(command)
-        if handler:
-            handler(args)
+        try:
+            pipeline = parse(command_line)
+        except ParseError as e:
+            self.print_output(f"bash: {e}")
+            self.print_output("")
+            return
+
+        if any(command.argv[0] in self.MAIN_THREAD_COMMANDS for command in pipeline.commands):
+            # Commands that touch widgets run right here on the Tk thread
+            self.run_pipeline(pipeline)
         else:
-            self.print_output(f"bash: {command}: command not found")
+            self._start_job(command_line.rstrip("&").rstrip(), pipeline)
+            if not pipeline.background:
+                return
 
         self.print_output("")  # Add a blank line for readability
 
+    def run_pipeline(self, pipeline):
+        """Runs a parsed pipeline on the Tk thread; see Shell.run_pipeline()."""
+        try:
+            self.shell.run_pipeline(pipeline)
+        finally:
+            # `cd` may have moved, and `exit` may have closed the terminal
+            if self.prompt_label.winfo_exists():
+                self.prompt_label.config(text=self._get_prompt())
+
+    # --- Job Control ---
+
+    def _start_job(self, command_line, pipeline):
+        """Submits a pipeline to the worker pool as a new job."""
+        job = Job(self._next_job_id, command_line, pipeline.background)
+        self._next_job_id += 1
+        self.jobs[job.id] = job
+        if job.background:
+            self.print_output(f"[{job.id}] {command_line}")
+        else:
+            self.foreground_job = job
+            self.prompt_label.config(text="")
+        job.future = self._executor.submit(self._run_job, job, pipeline)
+        if self._drain_id is None:
+            self._drain_id = self.after(self.OUTPUT_POLL_MS, self._drain_output)
+        return job
+
+    def _run_job(self, job, pipeline):
+        """Runs a pipeline on a worker thread."""
+        try:
+            self.shell.run_pipeline(pipeline, job)
+        except CommandCancelled:
+            pass
+        except Exception as e:
+            self._output_queue.put(("output", f"Error: {e}"))
+        finally:
+            self._output_queue.put(("done", job))
+
+    def _drain_output(self):
+        """Moves queued worker output into the output buffer on the Tk thread."""
+        self._drain_id = None
+        while True:
+            try:
+                kind, value = self._output_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "output":
+                self.print_output(value)
+            elif kind == "replace":
+                self.replace_output(*value)
+            elif kind == "call":
+                value()
+                if not self.winfo_exists():
+                    return  # A queued `exit` closed the terminal
+            else:
+                self._finish_job(value)
+        if self.jobs:
+            self._drain_id = self.after(self.OUTPUT_POLL_MS, self._drain_output)
+
+    def _finish_job(self, job):
+        del self.jobs[job.id]
+        if job is self.foreground_job:
+            self.foreground_job = None
+            self.print_output("")
+            self.prompt_label.config(text=self._get_prompt())
+        else:
+            status = "Cancelled" if job.cancelled.is_set() else "Done"
+            self.print_output(f"[{job.id}]+  {status:<10} {job.command_line}")
+
+    def current_job(self):
+        """Returns the job running on the calling worker thread, if any."""
+        return self.shell.current_job()
+
+    def _interrupt(self, event):
+        """Ctrl-C: cancels the foreground job, or discards the current line."""
+        if self._search is not None:
+            self._end_search(accept=False)
+        if self.foreground_job is not None:
+            self.foreground_job.cancel()
+            self.print_output("^C")
+        else:
+            self.print_output(f"{self._get_prompt()}{self.input_area.get()}^C")
+            self.input_area.delete(0, tk.END)
+            self.history_index = None
+        return "break"
+
+    def destroy(self):
+        for job in self.jobs.values():
+            job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        super().destroy()
+
     # --- New Functionality ---
     def _tab_completion(self, event):
-        """
-        Handles tab completion for commands and file paths.
-        """
+        """Handles tab completion for commands and file paths."""
+        if self._search is not None:
+            self._end_search(accept=True)
+            return "break"
         current_text = self.input_area.get()
-        if not current_text:
-            return
-
-        words = current_text.split()
-        if len(words) <= 1:
-            # Command completion
-            partial_command = words[0] if words else ""
-            matches = [
-                cmd for cmd in self.commands if cmd.startswith(partial_command)]
-            if len(matches) == 1:
-                self.input_area.delete(0, tk.END)
-                self.input_area.insert(0, matches[0] + " ")
-            elif len(matches) > 1:
-                self.print_output(" ".join(matches))
-        else:
-            # File path completion
-            partial_path = words[-1]
-            path_parts = partial_path.split('/')
-
-            # Simplified path resolution for demonstration
-            current_content = self.file_system.get(
-                self.current_directory, {"dirs": [], "files": []})
-            possible_matches = current_content["dirs"] + \
-                current_content["files"]
-
-            matches = [
-                item for item in possible_matches if item.startswith(partial_path)]
-            if len(matches) == 1:
-                self.input_area.delete(
-                    len(current_text) - len(partial_path), tk.END)
-                self.input_area.insert(tk.END, matches[0])
-            elif len(matches) > 1:
-                self.print_output(" ".join(matches))
+        text, listing = self.shell.complete(current_text)
+        if listing is not None:
+            self.print_output(listing)
+        elif text != current_text:
+            self.input_area.delete(0, tk.END)
+            self.input_area.insert(0, text)
         return "break"  # Prevents Tkinter from inserting a tab character
 
     def _history_up(self, event):
         """Navigates up in the command history."""
-        if self.command_history and self.history_index > 0:
+        if self._search is not None:
+            self._end_search(accept=True)
+        if self.history_index is None:
+            self.history_index = len(self.command_history)
+        if self.history_index > 0:
             self.history_index -= 1
             self.input_area.delete(0, tk.END)
             self.input_area.insert(0, self.command_history[self.history_index])
@@ -235,249 +527,339 @@ class TerminalApp(tk.Frame):
 
     def _history_down(self, event):
         """Navigates down in the command history."""
-        if self.command_history and self.history_index < len(self.command_history) - 1:
+        if self._search is not None:
+            self._end_search(accept=True)
+        if self.history_index is None:
+            return "break"
+        if self.history_index < len(self.command_history) - 1:
             self.history_index += 1
             self.input_area.delete(0, tk.END)
             self.input_area.insert(0, self.command_history[self.history_index])
-        elif self.history_index == len(self.command_history) - 1:
-            self.history_index += 1
+        else:
+            self.history_index = None
             self.input_area.delete(0, tk.END)
         return "break"  # Prevents the cursor from moving
 
-    # --- Command Handler Methods ---
-
-    def _cmd_clear(self, args):
-        self.text_area.config(state="normal")
-        self.text_area.delete("1.0", tk.END)
-        self.text_area.config(state="disabled")
-
-    def _cmd_help(self, args):
-        if not args:
-            self.print_output(
-                "Available commands:\n"
-                "  - help [command] Shows specific help for a command\n"
-                "  - clear          Clears the terminal screen\n"
-                "  - echo [text]    Prints the text back to the terminal\n"
-                "  - ls             Lists the contents of the current directory\n"
-                "  - cd [dir]       Changes the current directory\n"
-                "  - date           Displays the current date and time\n"
-                "  - sysinfo        Displays mock system information\n"
-                "  - mkdir [dir]    Creates a new directory\n"
-                "  - touch [file]   Creates a new file\n"
-                "  - rm [file]      Removes a file\n"
-                "  - rmdir [dir]    Removes an empty directory\n"
-                "  - whoami         Displays the current username\n"
-                "  - pydocs         Launches the Pydocs application\n"
-                "  - snake          Launches the Snake game\n"
-                "  - ping [ip/host] Simulates a network ping\n"
-                "  - ifconfig       Displays mock network configuration\n"
-                "  - exit           Closes the terminal application"
-            )
+    def _reverse_search(self, event):
+        """
+        Starts an incremental reverse history search, or moves on to the
+        next older match if one is already running. While searching, the
+        input line holds the query and the prompt shows the match.
+        """
+        if self._search is not None and self._search["kind"] != "history":
+            self._end_search(accept=False)
+        if self._search is None:
+            self._start_search("history")
         else:
-            command = args[0]
-            if command == "help":
-                self.print_output(
-                    "Usage: help [command]\nShows specific information for a given command.")
-            elif command == "clear":
-                self.print_output(
-                    "Usage: clear\nClears all text from the terminal screen.")
-            elif command == "echo":
-                self.print_output(
-                    "Usage: echo [text]\nPrints a line of text to the terminal.")
-            elif command == "ls":
-                self.print_output(
-                    "Usage: ls\nLists files and directories in the current directory.")
-            elif command == "cd":
-                self.print_output(
-                    "Usage: cd [directory]\nChanges the current directory. 'cd ..' moves to the parent directory. 'cd' with no arguments returns to the home directory.")
-            elif command == "date":
-                self.print_output(
-                    "Usage: date\nDisplays the current date and time.")
-            elif command == "sysinfo":
-                self.print_output(
-                    "Usage: sysinfo\nDisplays mock system information about the OS.")
-            elif command == "mkdir":
-                self.print_output(
-                    "Usage: mkdir [directory]\nCreates a new directory with the given name.")
-            elif command == "touch":
-                self.print_output(
-                    "Usage: touch [file]\nCreates a new, empty file with the given name.")
-            elif command == "rm":
-                self.print_output(
-                    "Usage: rm [file]\nRemoves a file. Does not work on directories.")
-            elif command == "rmdir":
-                self.print_output(
-                    "Usage: rmdir [directory]\nRemoves an empty directory.")
-            elif command == "whoami":
-                self.print_output(
-                    "Usage: whoami\nDisplays the name of the current user.")
-            elif command == "pydocs":
-                self.print_output(
-                    "Usage: pydocs\nLaunches the Pydocs word processor application.")
-            elif command == "snake":
-                self.print_output(
-                    "Usage: snake\nLaunches the classic Snake game.")
-            elif command == "ping":
-                self.print_output(
-                    "Usage: ping [ip/host]\nSimulates sending data packets to a network host.")
-            elif command == "ifconfig":
-                self.print_output(
-                    "Usage: ifconfig\nDisplays a mock network configuration for the system.")
-            elif command == "exit":
-                self.print_output(
-                    "Usage: exit\nCloses the terminal application and returns to the desktop.")
-            else:
-                self.print_output(f"Help: No help topic for '{command}'")
-
-    def _cmd_echo(self, args):
-        self.print_output(" ".join(args))
+            self._next_search_match()
+        return "break"
 
-    def _cmd_ls(self, args):
-        if self.current_directory in self.file_system:
-            dirs = self.file_system[self.current_directory]["dirs"]
-            files = self.file_system[self.current_directory]["files"]
+    def _output_search(self, event):
+        """
+        Starts an incremental search of the terminal output, or moves on to
+        the next match further up. Every stored line is searched, not just
+        the ones on screen, and the view scrolls to show each match.
+        """
+        if self._search is not None and self._search["kind"] != "output":
+            self._end_search(accept=True)
+        if self._search is None:
+            self._start_search("output")
+        else:
+            self._next_search_match()
+        return "break"
 
-            if dirs or files:
-                output = " ".join(f"\033[94m{d}\033[0m" for d in sorted(
-                    dirs)) + " " + " ".join(sorted(files))
-                self.print_output(output)
-            else:
-                self.print_output("")
+    def _start_search(self, kind):
+        saved = self.input_area.get()
+        self.input_area.delete(0, tk.END)
+        self._search = {"kind": kind, "saved": saved, "matches": None, "match": "",
+                        "before": None, "scan_id": None}
+        self._restart_search()
+
+    def _search_query_changed(self, *args):
+        if self._search is not None:
+            self._restart_search()
+
+    def _restart_search(self):
+        if self._search["kind"] == "output":
+            store = self.output_view.store
+            self._search["before"] = store.dropped + len(store)
         else:
-            self.print_output("Error: Directory not found")
+            self._search["matches"] = self.command_history.search(self.input_var.get())
+        self._next_search_match()
 
-    def _cmd_cd(self, args):
-        if not args or args[0] == "~":
-            self.current_directory = self.home_directory
-            self.prompt_label.config(text=self._get_prompt())
+    def _next_search_match(self):
+        query = self.input_var.get()
+        if self._search["kind"] == "output":
+            self._next_output_match(query)
             return
-
-        new_dir = args[0]
-        current_content = self.file_system.get(
-            self.current_directory, {"dirs": []})
-
-        if new_dir in current_content["dirs"]:
-            self.current_directory = new_dir
-        elif new_dir == "..":
-            if self.current_directory != "root":
-                parent_found = False
-                for parent, content in self.file_system.items():
-                    if self.current_directory in content["dirs"]:
-                        self.current_directory = parent
-                        parent_found = True
-                        break
-                if not parent_found:
-                    self.print_output("Error: Could not find parent directory")
+        match = next(self._search["matches"], None) if query else None
+        if match is not None:
+            self._search["match"] = match
+            label = f"(reverse-i-search)`{match}': "
+        elif query:
+            label = f"(failed reverse-i-search)`{self._search['match']}': "
         else:
-            self.print_output(f"Error: Directory not found '{new_dir}'")
+            self._search["match"] = ""
+            label = "(reverse-i-search)`': "
+        self.prompt_label.config(text=label)
 
+    def _next_output_match(self, query):
+        """
+        Searches up from the last match, a slice at a time so that a long
+        scrollback never holds the Tk thread for more than SEARCH_SLICE_MS.
+        A new query or Ctrl-F replaces a scan still in progress.
+        """
+        self._cancel_output_scan()
+        self.prompt_label.config(text="(output-search): ")
+        if query:
+            self._scan_output(query)
+
+    def _scan_output(self, query):
+        search = self._search
+        search["scan_id"] = None
+        store = self.output_view.store
+        # Positions are kept as dropped + index, so trimming doesn't move them
+        before = search["before"] - store.dropped
+        deadline = time.perf_counter() + self.SEARCH_SLICE_MS / 1000
+        while before > 0:
+            stop = before - self.SEARCH_BATCH_LINES
+            found = store.search(query, before, stop)
+            if found is not None:
+                line, column = found
+                search["before"] = store.dropped + line
+                self.output_view.show_match(line, column, len(query))
+                return
+            before = stop
+            if time.perf_counter() >= deadline:
+                search["before"] = store.dropped + max(before, 0)
+                search["scan_id"] = self.after(1, lambda: self._scan_output(query))
+                return
+        search["before"] = store.dropped + max(before, 0)
+        self.prompt_label.config(text="(failed output-search): ")
+
+    def _cancel_output_scan(self):
+        if self._search is not None and self._search.get("scan_id") is not None:
+            self.after_cancel(self._search["scan_id"])
+            self._search["scan_id"] = None
+
+    def _end_search(self, accept):
+        """Leaves a search, putting the history match (or the old line) back."""
+        self._cancel_output_scan()
+        search, self._search = self._search, None
+        text = search["match"] if accept and search["match"] else search["saved"]
+        self.input_area.delete(0, tk.END)
+        self.input_area.insert(0, text)
         self.prompt_label.config(text=self._get_prompt())
 
-    def _cmd_date(self, args):
-        now = datetime.datetime.now()
-        self.print_output(now.strftime("%A, %B %d, %Y %H:%M:%S"))
+    def _cancel_search(self, event):
+        if self._search is None:
+            return None  # Let the key reach other bindings
+        self._end_search(accept=False)
+        return "break"
 
-    def _cmd_sysinfo(self, args):
-        self.print_output("HomeOS (Python Terminal) v1.0.0")
-        self.print_output("OS Name: Python-based Simulated Environment")
-        self.print_output("Kernel: 5.15.0-76-generic (simulated)")
-        self.print_output(
-            f"Uptime: {datetime.timedelta(seconds=tk.Tcl().eval('info tclversion'))}")
+    # --- Command Handler Methods ---
 
-    def _cmd_mkdir(self, args):
-        if not args:
-            self.print_output("Error: Please specify a directory name.")
-            return
+    def _on_tk_thread(self, handler):
+        """
+        Wraps the handler of a command that touches widgets. Run from a
+        worker thread, as in a sourced script, the command is queued to run
+        on the Tk thread after the output before it, and prints its output
+        there; its errors are then not counted against the script.
+        """
+        def run(args, stdin):
+            if threading.current_thread() is self._ui_thread:
+                return handler(args, stdin)
+            self._output_queue.put(("call", lambda: self._run_queued(handler, args)))
+            return None
+        return run
+
+    def _run_queued(self, handler, args):
+        for line in handler(args, None) or ():
+            self.print_output(line)
+
+    def _cmd_clear(self, args, stdin):
+        self._output_buffer.clear()
+        self.output_view.clear()
+        self.scrollback.reset()
+        self.ansi_parser.reset()
+
+    def _cmd_pydocs(self, args, stdin):
+        self.launch_app_callback("pydocs")
 
-        new_dir_name = args[0]
-        if new_dir_name in self.file_system.get(self.current_directory, {"dirs": [], "files": []})["dirs"] or \
-           new_dir_name in self.file_system.get(self.current_directory, {"dirs": [], "files": []})["files"]:
-            self.print_output(
-                f"Error: Directory or file '{new_dir_name}' already exists.")
-        else:
-            self.file_system[self.current_directory]["dirs"].append(
-                new_dir_name)
-            self.file_system[new_dir_name] = {"dirs": [], "files": []}
-            self.print_output(f"Directory '{new_dir_name}' created.")
+    def _cmd_snake(self, args, stdin):
+        self.launch_app_callback("snake")
 
-    def _cmd_touch(self, args):
+    def _cmd_scrollback(self, args, stdin):
         if not args:
-            self.print_output("Error: Please specify a file name.")
+            lines = self.scrollback.max_lines or "unlimited"
+            size = self.scrollback.max_bytes or "unlimited"
+            yield f"Scrollback: {len(self.scrollback.line_sizes)} lines, {self.scrollback.total_bytes} bytes"
+            yield f"Limits: {lines} lines, {size} bytes"
             return
 
-        new_file_name = args[0]
-        if new_file_name in self.file_system.get(self.current_directory, {"dirs": [], "files": []})["dirs"] or \
-           new_file_name in self.file_system.get(self.current_directory, {"dirs": [], "files": []})["files"]:
-            self.print_output(
-                f"Error: File or directory '{new_file_name}' already exists.")
-        else:
-            self.file_system[self.current_directory]["files"].append(
-                new_file_name)
-            self.print_output(f"File '{new_file_name}' created.")
-
-    def _cmd_rm(self, args):
-        if not args:
-            self.print_output("Error: Please specify a file name.")
+        if len(args) != 2 or args[0] not in ("lines", "bytes") or not args[1].isdigit():
+            self.shell.error("Usage: scrollback [lines|bytes N]")
             return
 
-        file_to_remove = args[0]
-        if file_to_remove in self.file_system.get(self.current_directory, {"files": []})["files"]:
-            self.file_system[self.current_directory]["files"].remove(
-                file_to_remove)
-            self.print_output(f"File '{file_to_remove}' removed.")
+        if args[0] == "lines":
+            self.scrollback.max_lines = int(args[1])
         else:
-            self.print_output(
-                f"Error: File '{file_to_remove}' not found or is a directory.")
+            self.scrollback.max_bytes = int(args[1])
+        yield f"Scrollback {args[0]} limit set to {int(args[1]) or 'unlimited'}."
 
-    def _cmd_rmdir(self, args):
-        if not args:
-            self.print_output("Error: Please specify a directory name.")
+    def _cmd_ps(self, args, stdin):
+        if self.monitor is None:
+            self.shell.error("ps: no app monitor is running")
             return
+        yield from app_monitor.format_table(self.monitor.sample(allocations=True))
 
-        dir_to_remove = args[0]
-        if dir_to_remove in self.file_system.get(self.current_directory, {"dirs": []})["dirs"]:
-            if self.file_system.get(dir_to_remove, {"dirs": [], "files": []})["dirs"] or \
-               self.file_system.get(dir_to_remove, {"dirs": [], "files": []})["files"]:
-                self.print_output(
-                    f"Error: Directory '{dir_to_remove}' is not empty.")
-            else:
-                self.file_system[self.current_directory]["dirs"].remove(
-                    dir_to_remove)
-                del self.file_system[dir_to_remove]
-                self.print_output(f"Directory '{dir_to_remove}' removed.")
-        else:
-            self.print_output(
-                f"Error: Directory '{dir_to_remove}' not found or is a file.")
+    def _cmd_boot_trace(self, args, stdin):
+        tracer = boot_trace.tracer
+        if tracer is None:
+            self.shell.error("boot-trace: startup was not traced; "
+                             "start HomeOS with --boot-trace or HOMEOS_BOOT_TRACE=1")
+            return
+        unknown = [arg for arg in args if arg not in ("-a", "--json")]
+        if unknown:
+            self.shell.error(f"boot-trace: unknown option '{unknown[0]}'")
+            return
+        if "--json" in args:
+            yield tracer.to_json()
+            return
+        yield from boot_trace.format_timeline(list(tracer.events), 0.0 if "-a" in args else 1.0)
+        if tracer.path:
+            yield f"Saved to {tracer.path}"
+
+    def _cmd_stalls(self, args, stdin):
+        watchdog = self.monitor.watchdog if self.monitor is not None else None
+        if watchdog is None:
+            self.shell.error("stalls: no stall watchdog is running")
+            return
+        stalls = watchdog.recent()
+        if not stalls:
+            yield "No stalls recorded."
+        for stall in stalls:
+            yield stall.summary()
+            if "-v" in args:
+                for frame in stall.stack:
+                    yield from frame.rstrip("\n").split("\n")
+        yield ""
+        yield from app_monitor.format_latency(self.monitor.sample())
+
+    def _cmd_top(self, args, stdin):
+        interval, iterations = 2.0, None
+        trace_allocations = "-m" in args
+        args = [arg for arg in args if arg != "-m"]
+        try:
+            for option, value in zip(args[::2], args[1::2]):
+                if option == "-d":
+                    interval = max(float(value), 0.2)
+                elif option == "-n":
+                    iterations = int(value)
+                else:
+                    raise ValueError(option)
+            if len(args) % 2:
+                raise ValueError(args[-1])
+        except ValueError:
+            self.shell.error("Usage: top [-m] [-d seconds] [-n count]")
+            return None
+        if self.monitor is None:
+            self.shell.error("top: no app monitor is running")
+            return None
+
+        job = self.current_job()
+        if job is None:
+            # On the Tk thread, in a pipeline with a command that must run
+            # there, where waiting between frames would freeze the window:
+            # one frame of the totals so far
+            return self._top_frame(self.monitor.sample(allocations=True), {},
+                                   procstats.uptime_seconds(), procstats.CpuMeter(since_start=True))
+        if not self.shell.isatty():
+            iterations = 1  # A single plain frame when piped or redirected
+        if not trace_allocations:
+            return self._top_loop(job, interval, iterations)
+        with self.monitor.tracing_allocations():
+            return self._top_loop(job, interval, iterations)
+
+    def _top_loop(self, job, interval, iterations):
+        """Draws `top` frames until cancelled; returns the single frame if `iterations` is 1."""
+        cpu = procstats.CpuMeter()
+        totals = {row["name"]: row for row in self.monitor.sample()}
+        measured_from = time.monotonic()
+        job.sleep(min(interval, 0.5))  # Something to measure in the first frame
+        shown = frames = 0
+        while True:
+            rows = self.monitor.sample(allocations=True)
+            now = time.monotonic()
+            lines = self._top_frame(rows, totals, now - measured_from, cpu)
+            totals = {row["name"]: row for row in rows}
+            measured_from = now
+            frames += 1
+            if iterations == 1:
+                return lines
+            self.replace_output(shown, lines)
+            shown = len(lines)
+            if iterations is not None and frames >= iterations:
+                return None
+            job.sleep(interval)
+
+    def _top_frame(self, rows, totals, elapsed, cpu):
+        """Formats one `top` display, with callback counts since the last one."""
+        interval_rows = []
+        for row in rows:
+            before = totals.get(row["name"], {"calls": 0, "handler_time": 0.0})
+            interval_rows.append(dict(row, calls=row["calls"] - before["calls"],
+                                      handler_time=row["handler_time"] - before["handler_time"]))
+        rss = procstats.rss_bytes()
+        return [
+            f"top - up {datetime.timedelta(seconds=int(procstats.uptime_seconds()))}, "
+            f"{procstats.thread_count()} threads, "
+            f"RSS {procstats.format_bytes(rss) if rss is not None else 'unknown'}, "
+            f"CPU {cpu.percent():.1f}%",
+            "",
+        ] + app_monitor.format_table(interval_rows, interval=elapsed)
+
+    def _cmd_jobs(self, args, stdin):
+        for job in self.jobs.values():
+            if job is not self.foreground_job:
+                yield f"[{job.id}]   Running    {job.command_line} &"
+
+    def _cmd_fg(self, args, stdin):
+        job_id = args[0].lstrip("%") if args else None
+        if job_id is None and self.jobs:
+            job_id = str(max(self.jobs))
+        if not job_id or not job_id.isdigit() or int(job_id) not in self.jobs:
+            self.shell.error("bash: fg: no such job")
+            return
 
-    def _cmd_whoami(self, args):
-        self.print_output(self.user)
+        job = self.jobs[int(job_id)]
+        job.background = False
+        self.foreground_job = job
+        self.prompt_label.config(text="")
+        self.print_output(job.command_line)
 
-    def _cmd_pydocs(self, args):
-        self.launch_app_callback("pydocs")
+    def _cmd_exit(self, args, stdin):
+        self.on_close()
 
-    def _cmd_snake(self, args):
-        self.launch_app_callback("snake")
 
-    def _cmd_ping(self, args):
-        if not args:
-            self.print_output(
-                "Usage: ping [ip/host]\nSimulates sending data packets to a network host.")
-            return
+def main():
+    """Runs a command script against the terminal's filesystem, without a window."""
+    parser = argparse.ArgumentParser(description="Run HomeOS terminal commands in batch.")
+    parser.add_argument("--script", required=True,
+                        help="file of commands to run, one per line")
+    parser.add_argument("--user", default="admin",
+                        help="user to run the commands as (default: admin)")
+    args = parser.parse_args()
 
-        host = args[0]
-        self.print_output(f"PING {host} ({host}): 56 data bytes")
-        for i in range(4):
-            self.print_output(
-                f"64 bytes from {host}: icmp_seq={i+1} ttl=64 time={random.randint(10, 50)} ms")
+    try:
+        with open(args.script, encoding="utf-8") as script:
+            lines = script.read().splitlines()
+    except OSError as e:
+        parser.error(f"cannot read script: {e}")
+    shell = Shell(args.user, print, VFSStore(), CommandHistory(args.user),
+                  isatty=sys.stdout.isatty())
+    return 1 if shell.run_script(lines, args.script) else 0
 
-    def _cmd_ifconfig(self, args):
-        self.print_output(
-            "eth0: flags=209<UP,BROADCAST,MULTICAST>  mtu 1500\n"
-            "        inet 192.168.1.10  netmask 255.255.255.0  broadcast 192.168.1.255\n"
-            "        ether 00:11:22:33:44:55  txqueuelen 1000  (Ethernet)\n"
-            "lo: flags=73<UP,LOOPBACK,RUNNING>  mtu 65536\n"
-            "        inet 127.0.0.1  netmask 255.0.0.0\n"
-        )
 
-    def _cmd_exit(self, args):
-        self.on_close()
+if __name__ == "__main__":
+    sys.exit(main())
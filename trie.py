@@ -0,0 +1,98 @@
+class _TrieNode:
+    __slots__ = ("children", "count", "is_word")
+
+    def __init__(self):
+        self.children = {}
+        self.count = 0  # Number of words stored at or below this node
+        self.is_word = False
+
+
+class PrefixTrie:
+    """
+    A character trie used for tab completion.
+
+    Lookups walk one node per character of the prefix, so finding the
+    completions of a prefix does not depend on how many words are stored.
+    """
+
+    def __init__(self, words=()):
+        self.root = _TrieNode()
+        for word in words:
+            self.insert(word)
+
+    def __len__(self):
+        return self.root.count
+
+    def __contains__(self, word):
+        node = self._find(word)
+        return node is not None and node.is_word
+
+    def _find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def insert(self, word):
+        """Adds a word. Adding a word that is already present does nothing."""
+        if word in self:
+            return
+        node = self.root
+        node.count += 1
+        for char in word:
+            node = node.children.setdefault(char, _TrieNode())
+            node.count += 1
+        node.is_word = True
+
+    def remove(self, word):
+        """Removes a word, pruning branches that no longer lead anywhere."""
+        if word not in self:
+            return
+        node = self.root
+        node.count -= 1
+        for char in word:
+            child = node.children[char]
+            child.count -= 1
+            if child.count == 0:
+                del node.children[char]
+                return
+            node = child
+        node.is_word = False
+
+    def count(self, prefix=""):
+        """Returns how many stored words start with the prefix."""
+        node = self._find(prefix)
+        return node.count if node is not None else 0
+
+    def longest_common_prefix(self, prefix):
+        """
+        Returns the longest string shared by every word starting with the
+        prefix, or None if no word starts with it.
+        """
+        node = self._find(prefix)
+        if node is None or node.count == 0:
+            return None
+        chars = [prefix]
+        while not node.is_word and len(node.children) == 1:
+            char, node = next(iter(node.children.items()))
+            chars.append(char)
+        return "".join(chars)
+
+    def words(self, prefix="", limit=None):
+        """Yields stored words starting with the prefix in sorted order."""
+        node = self._find(prefix)
+        if node is None:
+            return
+        produced = 0
+        stack = [(prefix, node)]
+        while stack:
+            word, node = stack.pop()
+            if node.is_word:
+                yield word
+                produced += 1
+                if limit is not None and produced >= limit:
+                    return
+            for char in sorted(node.children, reverse=True):
+                stack.append((word + char, node.children[char]))
@@ -0,0 +1,61 @@
+def trigrams(text):
+    """Returns the set of three-character substrings of a string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    An inverted index from trigrams to the documents containing them.
+
+    Any document that contains a query string must contain every trigram of
+    that query, so intersecting the posting lists narrows a search down to
+    a few candidates that the caller then verifies. Posting lists keep
+    insertion order, so documents added with increasing ids come back
+    newest first.
+    """
+
+    def __init__(self):
+        self.postings = {}
+
+    def add(self, doc_id, text):
+        """Indexes a document's text under the given id."""
+        for gram in trigrams(text):
+            self.postings.setdefault(gram, {})[doc_id] = None
+
+    def remove(self, doc_id, text):
+        """Removes a document that was indexed with the given text."""
+        for gram in trigrams(text):
+            posting = self.postings.get(gram)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[gram]
+
+    def clear(self):
+        self.postings.clear()
+
+    def candidates(self, *queries):
+        """
+        Yields the ids of documents that may contain every query, most
+        recently added first. Queries shorter than three characters cannot
+        be narrowed down; use searchable() to check first.
+        """
+        grams = set().union(*(trigrams(query) for query in queries))
+        posting_lists = []
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                return
+            posting_lists.append(posting)
+        posting_lists.sort(key=len)
+        smallest, rest = posting_lists[0], posting_lists[1:]
+        # Snapshot the ids so documents can be added while results are consumed
+        for doc_id in reversed(list(smallest)):
+            if all(doc_id in posting for posting in rest):
+                yield doc_id
+
+    @staticmethod
+    def searchable(query):
+        """Returns True if the index can narrow down a search for the query."""
+        return len(query) >= 3
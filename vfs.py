@@ -0,0 +1,400 @@
+import threading
+
+from search_index import SearchIndex
+from trie import PrefixTrie
+
+
+class VFSError(Exception):
+    """Raised when a virtual filesystem operation cannot be completed."""
+
+
+class FileContent:
+    """
+    The body of a file, stored as a list of byte chunks of at most
+    CHUNK_SIZE bytes.
+
+    Only the last chunk is ever written to, so appending never copies
+    existing data, and readers walk the chunks without joining them.
+
+    A file loaded from a snapshot starts out backed by a (buffer, offset,
+    size) slice of the memory-mapped image and is only copied into chunks
+    the first time it is modified.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, source=None):
+        self.chunks = []
+        self.size = source[2] if source else 0
+        self.source = source
+
+    def _materialize(self):
+        """Copies a snapshot-backed body into writable chunks."""
+        buffer, offset, size = self.source
+        self.chunks = [bytearray(buffer[offset + start:offset + min(start + self.CHUNK_SIZE, size)])
+                       for start in range(0, size, self.CHUNK_SIZE)]
+        self.source = None
+
+    def _chunk_count(self):
+        if self.source is not None:
+            return -(-self.size // self.CHUNK_SIZE)
+        return len(self.chunks)
+
+    def _chunk(self, index):
+        """Returns one chunk, read straight from the snapshot if not yet copied."""
+        source = self.source
+        if source is not None:
+            buffer, offset, size = source
+            start = index * self.CHUNK_SIZE
+            return buffer[offset + start:offset + min(start + self.CHUNK_SIZE, size)]
+        return self.chunks[index]
+
+    def append(self, data):
+        """Appends bytes (or text, encoded as UTF-8) to the end of the file."""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if self.source is not None:
+            self._materialize()
+        self.size += len(data)
+        view = memoryview(data)
+        while view:
+            if not self.chunks or len(self.chunks[-1]) >= self.CHUNK_SIZE:
+                self.chunks.append(bytearray())
+            last = self.chunks[-1]
+            room = self.CHUNK_SIZE - len(last)
+            last += view[:room]
+            view = view[room:]
+
+    def truncate(self):
+        self.chunks = []
+        self.size = 0
+        self.source = None
+
+    def last_bytes(self, count):
+        """Returns up to the last `count` bytes of the file."""
+        data = b""
+        for index in range(self._chunk_count() - 1, -1, -1):
+            data = bytes(self._chunk(index)[-(count - len(data)):]) + data
+            if len(data) >= count:
+                break
+        return data
+
+    def iter_chunks(self, start=(0, 0)):
+        """
+        Yields the file's bytes chunk by chunk, beginning at a
+        (chunk index, offset) position.
+        """
+        index, offset = start
+        # Fix the chunk count up front so a concurrent append can't shift it
+        for index in range(index, self._chunk_count()):
+            yield bytes(self._chunk(index)[offset:])
+            offset = 0
+
+    def iter_lines(self, start=(0, 0)):
+        """Yields decoded lines without their newlines, reading chunk by chunk."""
+        pending = b""
+        for chunk in self.iter_chunks(start):
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line.decode("utf-8", errors="replace")
+        if pending:
+            yield pending.decode("utf-8", errors="replace")
+
+    def tail_lines(self, count):
+        """
+        Yields the last `count` lines. The newlines are counted by scanning
+        backwards from the end, so only the tail of the file is read.
+        """
+        if count <= 0 or not self.size:
+            return
+        last_index = self._chunk_count() - 1
+        remaining = count
+        for index in range(last_index, -1, -1):
+            chunk = bytes(self._chunk(index))
+            end = len(chunk)
+            if index == last_index and chunk.endswith(b"\n"):
+                end -= 1  # A trailing newline doesn't start another line
+            while True:
+                newline = chunk.rfind(b"\n", 0, end)
+                if newline == -1:
+                    break
+                remaining -= 1
+                if remaining == 0:
+                    yield from self.iter_lines((index, newline + 1))
+                    return
+                end = newline
+        yield from self.iter_lines()
+
+
+# Serialises the lazy loading of snapshot directories across threads
+_load_lock = threading.Lock()
+
+
+class Inode:
+    """
+    A single node in the virtual filesystem tree.
+
+    Directories keep their children in a dict keyed by name, and every node
+    keeps a pointer to its parent, so walking up or down the tree costs one
+    dict lookup per path segment regardless of how large the tree is.
+
+    A directory restored from a snapshot has a `loader` instead of children
+    until something first looks inside it.
+    """
+
+    __slots__ = ("name", "parent", "is_dir", "_children", "loader", "content", "completions")
+
+    def __init__(self, name, parent=None, is_dir=False, loader=None, content=None):
+        self.name = name
+        self.parent = parent
+        self.is_dir = is_dir
+        self._children = {} if is_dir else None
+        self.loader = loader
+        self.content = None if is_dir else (content or FileContent())
+        # Prefix trie of child names, built on first tab completion
+        self.completions = None
+
+    @property
+    def children(self):
+        if self.loader is not None:
+            with _load_lock:
+                if self.loader is not None:
+                    self._children = self.loader(self)
+                    self.loader = None
+        return self._children
+
+    def __repr__(self):
+        kind = "dir" if self.is_dir else "file"
+        return f"<Inode {kind} {self.name!r}>"
+
+
+class VirtualFileSystem:
+    """
+    A hierarchical in-memory filesystem made of Inode objects.
+
+    Paths may be absolute ("/home/user") or relative to a working directory
+    ("../etc"), and "~" expands to the configured home directory.
+    Mutations are serialised by a lock so terminal jobs running on worker
+    threads can share one filesystem.
+    """
+
+    def __init__(self):
+        self.root = Inode("", is_dir=True)
+        self.root.parent = self.root
+        self.home = self.root
+        self.lock = threading.RLock()
+        # Name and content indexes for find/grep -r, built on first search
+        self.search_index = None
+        # Receives a record of every mutation when persistence is enabled
+        self.journal = None
+
+    # --- Path helpers ---
+
+    def path_of(self, node):
+        """Returns the absolute path of a node by following parent pointers."""
+        parts = []
+        while node is not self.root:
+            parts.append(node.name)
+            node = node.parent
+        return "/" + "/".join(reversed(parts))
+
+    def _split(self, path, cwd):
+        """Returns the starting node and the list of segments for a path."""
+        if path == "~" or path.startswith("~/"):
+            start = self.home
+            path = path[1:]
+        elif path.startswith("/"):
+            start = self.root
+        else:
+            start = cwd if cwd is not None else self.root
+        return start, [part for part in path.split("/") if part and part != "."]
+
+    def _walk(self, node, part, path):
+        """Moves one segment from a directory node."""
+        if not node.is_dir:
+            raise VFSError(f"Not a directory: '{path}'")
+        if part == "..":
+            return node.parent
+        child = node.children.get(part)
+        if child is None:
+            raise VFSError(f"No such file or directory: '{path}'")
+        return child
+
+    def resolve(self, path, cwd=None):
+        """Returns the node at the given path."""
+        node, parts = self._split(path, cwd)
+        for part in parts:
+            node = self._walk(node, part, path)
+        return node
+
+    def resolve_dir(self, path, cwd=None):
+        """Returns the directory node at the given path."""
+        node = self.resolve(path, cwd)
+        if not node.is_dir:
+            raise VFSError(f"Not a directory: '{path}'")
+        return node
+
+    def resolve_parent(self, path, cwd=None):
+        """Returns the parent directory of a path and the final segment name."""
+        node, parts = self._split(path, cwd)
+        if not parts or parts[-1] == "..":
+            raise VFSError(f"Invalid path: '{path}'")
+        for part in parts[:-1]:
+            node = self._walk(node, part, path)
+        if not node.is_dir:
+            raise VFSError(f"Not a directory: '{path}'")
+        return node, parts[-1]
+
+    def completion_trie(self, node):
+        """
+        Returns the prefix trie of a directory's child names. The trie is
+        built the first time it is needed and kept in sync afterwards.
+        """
+        with self.lock:
+            if node.completions is None:
+                node.completions = PrefixTrie(node.children)
+            return node.completions
+
+    def walk(self, node):
+        """Yields a node and everything below it, depth first."""
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            if node.is_dir:
+                stack.extend(list(node.children.values()))
+
+    def get_search_index(self, check=None):
+        """
+        Returns the name and content index, building it on first use. The
+        mutating operations below keep it up to date from then on.
+
+        `check` is called as the build goes along and may raise to abandon
+        it, in which case it starts over on the next call.
+        """
+        with self.lock:
+            if self.search_index is None:
+                index = SearchIndex()
+                for node in self.walk(self.root):
+                    if check is not None:
+                        check()
+                    if node is not self.root:
+                        index.add_node(node, check)
+                self.search_index = index
+            return self.search_index
+
+    # --- Mutating operations ---
+
+    def _add_child(self, parent, name, is_dir):
+        if name in parent.children:
+            raise VFSError(f"Directory or file '{name}' already exists.")
+        node = Inode(name, parent, is_dir)
+        parent.children[name] = node
+        if parent.completions is not None:
+            parent.completions.insert(name)
+        if self.search_index is not None:
+            self.search_index.add_node(node)
+        if self.journal is not None:
+            self.journal.record("mkdir" if is_dir else "touch", self.path_of(node))
+        return node
+
+    def _unlink(self, node):
+        parent = node.parent
+        del parent.children[node.name]
+        if parent.completions is not None:
+            parent.completions.remove(node.name)
+        if self.search_index is not None:
+            self.search_index.remove_node(node)
+        if self.journal is not None:
+            self.journal.record("unlink", self.path_of(node))
+
+    def mkdir(self, path, cwd=None, parents=False):
+        """
+        Creates a directory.
+
+        Args:
+            path (str): The directory to create.
+            cwd (Inode): The directory relative paths are resolved against.
+            parents (bool): Create missing parents and ignore existing
+                directories, like `mkdir -p`.
+
+        Returns:
+            Inode: The (possibly pre-existing) directory node.
+        """
+        with self.lock:
+            if not parents:
+                parent, name = self.resolve_parent(path, cwd)
+                return self._add_child(parent, name, True)
+
+            node, parts = self._split(path, cwd)
+            for part in parts:
+                if part == "..":
+                    node = node.parent
+                    continue
+                child = node.children.get(part)
+                if child is None:
+                    child = self._add_child(node, part, True)
+                elif not child.is_dir:
+                    raise VFSError(f"File exists and is not a directory: '{part}'")
+                node = child
+            return node
+
+    def touch(self, path, cwd=None):
+        """Creates an empty file, or returns the existing node at that path."""
+        with self.lock:
+            parent, name = self.resolve_parent(path, cwd)
+            existing = parent.children.get(name)
+            if existing is not None:
+                return existing
+            return self._add_child(parent, name, False)
+
+    def open_for_write(self, path, cwd=None, append=False):
+        """
+        Returns the file node at a path for writing, creating it if needed
+        and emptying it unless appending.
+        """
+        with self.lock:
+            node = self.touch(path, cwd)
+            if node.is_dir:
+                raise VFSError(f"'{path}' is a directory.")
+            if not append:
+                if self.search_index is not None:
+                    self.search_index.clear_content(node)
+                if self.journal is not None:
+                    self.journal.record("truncate", self.path_of(node))
+                node.content.truncate()
+            return node
+
+    def write(self, node, text):
+        """Appends text (or bytes) to a file node."""
+        data = text.encode("utf-8") if isinstance(text, str) else text
+        with self.lock:
+            if self.search_index is not None:
+                self.search_index.append_content(
+                    node, node.content.last_bytes(2), data)
+            if self.journal is not None:
+                self.journal.record("write", self.path_of(node), data)
+            node.content.append(data)
+
+    def remove(self, path, cwd=None):
+        """Removes a file."""
+        with self.lock:
+            node = self.resolve(path, cwd)
+            if node.is_dir:
+                raise VFSError(f"'{path}' is a directory.")
+            self._unlink(node)
+            return node
+
+    def rmdir(self, path, cwd=None):
+        """Removes an empty directory."""
+        with self.lock:
+            node = self.resolve(path, cwd)
+            if not node.is_dir:
+                raise VFSError(f"'{path}' is not a directory.")
+            if node is self.root:
+                raise VFSError("Cannot remove the root directory.")
+            if node.children:
+                raise VFSError(f"Directory '{path}' is not empty.")
+            self._unlink(node)
+            return node
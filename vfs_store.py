@@ -0,0 +1,255 @@
+import base64
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+
+from appdata import data_path
+from vfs import FileContent, Inode, VFSError
+
+MAGIC = b"HOMEOSFS2\n"
+HEADER = struct.Struct("<QQ")       # Generation, offset of the root directory record
+COUNT = struct.Struct("<I")         # Number of entries in a directory record
+ENTRY = struct.Struct("<BHQQ")      # is_dir, name length, offset, length
+
+
+class VFSStore:
+    """
+    Persists a VirtualFileSystem as a snapshot image plus a journal.
+
+    The image is a compact binary file: the raw bytes of every file,
+    followed by one record per directory listing its entries and where to
+    find them. On startup the image is memory-mapped and only the root
+    directory is decoded; every other directory is decoded the first time
+    it is opened, and file bodies are read straight from the mapping until
+    they are modified, so boot time does not depend on how much is stored.
+
+    Every mutation since the image was written is appended to the journal
+    as a JSON line. Records are buffered while a command runs and flushed
+    (and fsynced) by commit() before the command is reported complete. Once
+    the journal grows past COMPACT_RECORDS the image is rewritten and the
+    journal emptied.
+
+    Each image is numbered with a generation, which is part of its file
+    name and header, and every journal record carries the generation of
+    the image it applies to. A new image is written under a new name, so
+    the one still mapped is never replaced, and if HomeOS stops before the
+    journal is emptied, the records the new image already contains are
+    recognised by their older generation and skipped.
+    """
+
+    COMPACT_RECORDS = 20000
+
+    def __init__(self, image_path=None, journal_path=None):
+        self.image_path = image_path or data_path("vfs", "image.bin")
+        self.journal_path = journal_path or data_path("vfs", "journal.log")
+        self.file_system = None
+        self.generation = 0
+        self._mapping = None
+        self._pending = []
+        self._journal_records = 0
+        self._lock = threading.Lock()  # Guards _pending
+        # Held while records go from _pending into the journal, and while
+        # compacting, so records reach the journal in the order they were
+        # made and with the generation current when they were taken
+        self._journal_lock = threading.Lock()
+
+    # --- Loading ---
+
+    def load(self, file_system):
+        """
+        Restores a filesystem from disk and starts journaling its changes.
+
+        Returns:
+            bool: False if nothing was stored yet, so the caller should
+                populate the filesystem itself.
+        """
+        self.file_system = file_system
+        restored = self._map_image(file_system)
+        if os.path.exists(self.journal_path):
+            self._replay(file_system)
+            restored = True
+        file_system.journal = self
+        return restored
+
+    def _image_file(self, generation):
+        root, ext = os.path.splitext(self.image_path)
+        return f"{root}.{generation}{ext}"
+
+    def _image_generations(self):
+        """Returns the generations of the images on disk, newest first."""
+        directory, name = os.path.split(self.image_path)
+        root, ext = os.path.splitext(name)
+        pattern = re.compile(re.escape(root) + r"\.(\d+)" + re.escape(ext))
+        try:
+            names = os.listdir(directory or ".")
+        except OSError:
+            return []
+        return sorted((int(match.group(1)) for match in map(pattern.fullmatch, names) if match),
+                      reverse=True)
+
+    def _map_image(self, file_system):
+        for generation in self._image_generations():
+            try:
+                with open(self._image_file(generation), "rb") as f:
+                    mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                continue  # Unreadable or empty image
+            if mapping[:len(MAGIC)] != MAGIC:
+                mapping.close()
+                continue
+            self._mapping = mapping
+            self.generation, root_offset = HEADER.unpack_from(mapping, len(MAGIC))
+            file_system.root.loader = self._directory_loader(root_offset)
+            self._remove_old_images()
+            return True
+        return False
+
+    def _remove_old_images(self):
+        """Deletes the images older than the current one."""
+        for generation in self._image_generations():
+            if generation < self.generation:
+                try:
+                    os.remove(self._image_file(generation))
+                except OSError:
+                    pass  # Still mapped on Windows; removed on the next start
+
+    def _directory_loader(self, offset):
+        """Returns a function that decodes a directory record on demand."""
+        mapping = self._mapping
+
+        def load(directory):
+            children = {}
+            (count,) = COUNT.unpack_from(mapping, offset)
+            position = offset + COUNT.size
+            for _ in range(count):
+                is_dir, name_length, target, length = ENTRY.unpack_from(mapping, position)
+                position += ENTRY.size
+                name = mapping[position:position + name_length].decode("utf-8")
+                position += name_length
+                if is_dir:
+                    child = Inode(name, directory, True, loader=self._directory_loader(target))
+                else:
+                    child = Inode(name, directory, False,
+                                  content=FileContent((mapping, target, length)))
+                children[name] = child
+            return children
+
+        return load
+
+    def _replay(self, file_system):
+        """Applies the journal on top of the image."""
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # A torn final record from a crash
+                if record.get("gen", 0) < self.generation:
+                    continue  # Already part of the image
+                try:
+                    self._apply(file_system, record)
+                except VFSError:
+                    pass  # Keep the rest of the journal if one record no longer applies
+                self._journal_records += 1
+
+    @staticmethod
+    def _apply(file_system, record):
+        op, path = record["op"], record["path"]
+        if op == "mkdir":
+            file_system.mkdir(path, parents=True)
+        elif op == "touch":
+            file_system.touch(path)
+        elif op == "truncate":
+            file_system.open_for_write(path)
+        elif op == "write":
+            node = file_system.open_for_write(path, append=True)
+            file_system.write(node, base64.b64decode(record["data"]))
+        elif op == "unlink":
+            if file_system.resolve(path).is_dir:
+                file_system.rmdir(path)
+            else:
+                file_system.remove(path)
+
+    # --- Journaling ---
+
+    def record(self, op, path, data=None):
+        """Buffers one mutation; called by the filesystem under its lock."""
+        with self._lock:
+            if op == "write" and self._pending and self._pending[-1][:2] == ("write", path):
+                # Coalesce a stream of writes to the same file into one record
+                self._pending[-1][2].append(data)
+                return
+            self._pending.append((op, path, [data] if data is not None else None))
+
+    def commit(self):
+        """Writes buffered records to the journal and syncs them to disk."""
+        with self._journal_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                generation = self.generation
+            if not pending:
+                return
+            lines = []
+            for op, path, data in pending:
+                record = {"gen": generation, "op": op, "path": path}
+                if data is not None:
+                    record["data"] = base64.b64encode(b"".join(data)).decode("ascii")
+                lines.append(json.dumps(record) + "\n")
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_records += len(lines)
+            needs_compaction = self._journal_records > self.COMPACT_RECORDS
+        if needs_compaction:
+            self.compact()
+
+    # --- Snapshots ---
+
+    def compact(self):
+        """Writes a fresh image of the whole filesystem and empties the journal."""
+        file_system = self.file_system
+        with file_system.lock, self._journal_lock:
+            generation = self.generation + 1
+            temp_path = self.image_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(MAGIC)
+                f.write(HEADER.pack(generation, 0))
+                root_offset = self._write_directory(f, file_system.root)
+                f.seek(len(MAGIC))
+                f.write(HEADER.pack(generation, root_offset))
+                f.flush()
+                os.fsync(f.fileno())
+            # The old image stays mapped for directories not loaded yet, so
+            # the new one gets a name of its own
+            os.replace(temp_path, self._image_file(generation))
+            open(self.journal_path, "w").close()
+            with self._lock:
+                # Buffered records are already part of the new image
+                self._pending = []
+                self.generation = generation
+            self._journal_records = 0
+            self._remove_old_images()
+
+    def _write_directory(self, f, directory):
+        """Writes a directory's files and subdirectories, then its own record."""
+        entries = []
+        for name, child in list(directory.children.items()):
+            if child.is_dir:
+                entries.append((1, name, self._write_directory(f, child), 0))
+            else:
+                offset = f.tell()
+                for chunk in child.content.iter_chunks():
+                    f.write(chunk)
+                entries.append((0, name, offset, child.content.size))
+
+        offset = f.tell()
+        f.write(COUNT.pack(len(entries)))
+        for is_dir, name, target, length in entries:
+            encoded = name.encode("utf-8")
+            f.write(ENTRY.pack(is_dir, len(encoded), target, length))
+            f.write(encoded)
+        return offset